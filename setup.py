@@ -27,7 +27,10 @@ setup(
     packages=find_packages("src"),
     package_dir = {"": "src"},
     # from https://stackoverflow.com/a/57749691
-    package_data = {'dictionary' : ['data/dicionaries/i*.json']},
+    # the compiled dictionary is only there if it was built before
+    # packaging, with python -m agdrvalidator.data.dictionaries.agdrdictionary
+    package_data = {'dictionary' : ['data/dicionaries/i*.json'],
+                    'agdrvalidator.data.dictionaries' : ['*.compiled.pickle']},
     include_package_data=True,
     install_requires=REQUIREMENTS,
     entry_points={
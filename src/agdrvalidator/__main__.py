@@ -24,6 +24,8 @@ def getParser():
     parser.add_argument("-t", "--tsv", help="include this flag to convert spreadsheet to TSV output for Gen3 ingest", required=False, action='store_true')
     parser.add_argument("-l", "--loglevel", type=int, help="verbosity level, for debugging. Default is 0, highest is 3", required=False)
     parser.add_argument('-v', '--validate', action='count', default=0, help="validate the input file. -v will generate a report with all detected errors; -vv will generate a report with all detected errors and warnings. Default is 0.")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="number of worker processes used to parse the spreadsheet tabs in parallel. Default is 1 (no parallelism).", required=False)
+    parser.add_argument("--no-cache", help="always parse and validate the whole spreadsheet, instead of reusing results of an earlier run", required=False, action='store_true')
     parser.add_argument("--version", action="version", version=version.version("0"))
     return parser
 
@@ -71,23 +73,29 @@ def main():
     validation_verbosity = args.validate
     write_to_stdout = args.stdout
 
-    from agdrvalidator.data.dictionaries.agdrdictionary import loadDictionary
+    from agdrvalidator.data.dictionaries.agdrdictionary import (
+        loadDictionary, selectDictionaryVersion)
     from agdrvalidator.parser.excel.agdrspreadsheet import \
         Agdr as AgdrSpreadsheetParser
     from agdrvalidator.schema.agdrschema import AGDR as AGDRSchema
     from agdrvalidator.schema.validator import AGDRValidator as AGDRValidator
+    from agdrvalidator.utils.parsecache import ParseCache
+    from agdrvalidator.utils.populationcache import PopulationCache
+    from agdrvalidator.utils.rowcache import RowValidationCache
 
 
     excelpath = args.spreadsheet
     try:
-        metadata = AgdrSpreadsheetParser(excelpath, project=project)
-        print(f"VALIDATOR VERSION: \t\t{version.version(metadata.version)}\n")
+        cache = None if args.no_cache else ParseCache()
+        metadata = AgdrSpreadsheetParser(excelpath, project=project, jobs=args.jobs, cache=cache)
+        dictionary_version = selectDictionaryVersion(metadata.version)
+        print(f"VALIDATOR VERSION: \t\t{version.version(metadata.version, dictionary_version)}\n")
         metadata.parse()
     except FileNotFoundError:
         print(f"The file at {excelpath} was not found. Please check the file path and try again.")
         sys.exit(1)
 
-    schema = loadDictionary()
+    schema = loadDictionary(dictionary_version, cache)
     
     report_file = None 
     if not write_to_stdout:
@@ -95,9 +103,11 @@ def main():
     cleanUpFile(report_file)
 
     # is clearly a dictionary
-    agdrschema = AGDRSchema(schema, metadata.nodes, report_file, project=project, program=program )
+    population_cache = PopulationCache(cache) if cache else None
+    agdrschema = AGDRSchema(schema, metadata.nodes, report_file, project=project, program=program, population_cache=population_cache)
 
-    validator = AGDRValidator(schema, agdrschema, report_file)
+    row_cache = RowValidationCache(cache, excelpath) if cache else None
+    validator = AGDRValidator(schema, agdrschema, report_file, row_cache=row_cache)
     validator.validate(validation_verbosity)
 
     if args.tsv:
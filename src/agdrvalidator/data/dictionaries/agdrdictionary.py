@@ -1,13 +1,214 @@
+'''
+This file loads the AGDR metadata dictionary.
+
+Parsing the Gen3 dictionary JSON (and resolving all of its $refs) is
+done on every run, but always gives the same result for the same
+dictionary and the same version of the validator. The parsed schema
+can therefore be compiled into an artifact: a pickle of the parsed
+schema, together with the key it was built for. The key is a hash of
+the dictionary JSON, the validator version and the source of the code
+that parses the dictionary, so an artifact is never used with a
+dictionary or a parser it was not built from.
+
+A compiled artifact is looked for next to the dictionary JSON (built
+at packaging time, see buildCompiledDictionary()), then in the runtime
+cache; if neither matches, the dictionary is parsed and the result is
+stored in the runtime cache for the next run.
+
+Several versions of the dictionary can be bundled, so that workbooks
+made from older templates keep validating against the dictionary they
+were made for. DICTIONARIES lists the bundled dictionaries, and
+TEMPLATE_DICTIONARIES which template versions each of them is used for
+(see selectDictionaryVersion()). Loaded dictionaries are kept in memory,
+up to MAX_LOADED_DICTIONARIES of them, so that a process validating
+workbooks of mixed template versions does not reload them.
+'''
+import argparse
+import bisect
+import collections
+import hashlib
 import os
+import pickle
 
+from alive_progress import alive_bar
+
+import agdrvalidator.globals.version as version
+from agdrvalidator import AgdrNotFoundException
 from agdrvalidator.parser.dictionary.gen3parser import Gen3 as Gen3Dictionary
+from agdrvalidator.utils import logger
+
+logger = logger.setUp(__name__)
 
 # how to get loading data file to work:
 # https://stackoverflow.com/a/57749691
 
-def loadDictionary():
-    location = os.path.dirname(os.path.realpath(__file__))
-    dict_file = os.path.join(location, "gen3.nesi_2025_01_24.json")
+LOCATION = os.path.dirname(os.path.realpath(__file__))
+
+# dictionary version -> dictionary JSON bundled with the package
+DICTIONARIES = {
+    "2025_01_24": "gen3.nesi_2025_01_24.json",
+}
+
+# (first template version, dictionary version), sorted by template
+# version: a template uses the dictionary of the last entry at or
+# before its version
+TEMPLATE_DICTIONARIES = [
+    ("0000_00_00", "2025_01_24"),
+]
+
+DICTIONARY_FILE = os.path.join(LOCATION, DICTIONARIES[version.DEFAULT_DICTIONARY_VERSION])
+
+# number of parsed dictionaries kept in memory
+MAX_LOADED_DICTIONARIES = 4
+_loaded = collections.OrderedDict() # dictionary version -> schema, least recently used first
+
+# bump this when the layout of the compiled artifact changes
+COMPILED_FORMAT = 1
+
+
+def _parserSources():
+    '''
+    the modules whose code determines what a parsed dictionary looks like
+    '''
+    import agdrvalidator.parser.dictionary.gen3parser as gen3parser
+    import agdrvalidator.schema.gen3schema as gen3schema
+    import agdrvalidator.schema.node.gen3node as gen3node
+    import agdrvalidator.schema.node.property.gen3property as gen3property
+    import agdrvalidator.schema.refresolver as refresolver
+    return [module.__file__ for module in (gen3parser, gen3schema, gen3node, gen3property, refresolver)]
+
+
+def selectDictionaryVersion(template_version):
+    '''
+    the version of the dictionary to validate a workbook of the given
+    template version (as found in its NeSI_internal_use tab) against
+    '''
+    if not template_version:
+        return version.DEFAULT_DICTIONARY_VERSION
+    template_version = str(template_version).strip()
+    index = bisect.bisect_right([first for first, _ in TEMPLATE_DICTIONARIES], template_version)
+    if index == 0:
+        logger.warning(f"no dictionary for template version {template_version}, using {version.DEFAULT_DICTIONARY_VERSION}")
+        return version.DEFAULT_DICTIONARY_VERSION
+    return TEMPLATE_DICTIONARIES[index - 1][1]
+
+
+def dictionaryFile(dictionary_version=None):
+    dictionary_version = dictionary_version or version.DEFAULT_DICTIONARY_VERSION
+    if dictionary_version not in DICTIONARIES:
+        raise AgdrNotFoundException(f"no bundled dictionary of version {dictionary_version}, known versions: {', '.join(DICTIONARIES)}")
+    return os.path.join(LOCATION, DICTIONARIES[dictionary_version])
+
+
+def dictionaryKey(dict_file=DICTIONARY_FILE):
+    digest = hashlib.sha256()
+    digest.update(f"{version.version()}:{COMPILED_FORMAT}".encode())
+    for path in [dict_file] + _parserSources():
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def compiledPath(dict_file=DICTIONARY_FILE):
+    return os.path.splitext(dict_file)[0] + ".compiled.pickle"
+
+
+def _parseDictionary(dict_file, resolveProperties=False):
+    '''
+    the properties of each node are parsed on first use, unless
+    resolveProperties; a compiled schema must have them all
+    '''
     g3dict = Gen3Dictionary(dict_file)
     schema = g3dict.parse()
-    return schema
\ No newline at end of file
+    if resolveProperties:
+        schema.resolveProperties()
+    return schema
+
+
+def _loadCompiled(path, key):
+    '''
+    schema from a compiled artifact, or None if there is no artifact
+    or it was built for another key
+    '''
+    try:
+        with open(path, "rb") as f:
+            compiled = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"ignoring unreadable compiled dictionary {path}: {e}")
+        return None
+    if compiled.get("key") != key:
+        logger.info(f"compiled dictionary {path} is out of date")
+        return None
+    return compiled["schema"]
+
+
+def buildCompiledDictionary(dict_file=DICTIONARY_FILE, output=None):
+    '''
+    parse the dictionary and write the compiled artifact, e.g. at
+    packaging time; returns the path of the artifact
+    '''
+    output = output or compiledPath(dict_file)
+    compiled = {
+        "key": dictionaryKey(dict_file),
+        "schema": _parseDictionary(dict_file, resolveProperties=True),
+    }
+    with open(output, "wb") as f:
+        pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return output
+
+
+def loadDictionary(dictionary_version=None, cache=None):
+    '''
+    returns the parsed AGDR dictionary (a Gen3 schema) of the given
+    version, the default version if None
+
+    cache is a ParseCache, used to keep the compiled dictionary between
+    runs; if None, only a compiled artifact shipped with the package is used
+    '''
+    dictionary_version = dictionary_version or version.DEFAULT_DICTIONARY_VERSION
+    if dictionary_version in _loaded:
+        logger.info(f"dictionary {dictionary_version} already loaded")
+        _loaded.move_to_end(dictionary_version)
+        return _loaded[dictionary_version]
+    schema = _loadDictionary(dictionaryFile(dictionary_version), cache)
+    _loaded[dictionary_version] = schema
+    while len(_loaded) > MAX_LOADED_DICTIONARIES:
+        evicted, _ = _loaded.popitem(last=False)
+        logger.info(f"dictionary {evicted} evicted from memory")
+    return schema
+
+
+def _loadDictionary(dict_file, cache):
+    key = dictionaryKey(dict_file)
+
+    schema = _loadCompiled(compiledPath(dict_file), key)
+    if schema is None and cache:
+        compiled = cache.load(key)
+        schema = compiled["schema"] if compiled else None
+    if schema is not None:
+        logger.info("using compiled dictionary")
+        with alive_bar(title="\tLoading data dictionary ") as bar:
+            bar(len(schema.nodes))
+        return schema
+
+    # the properties of each node are only parsed if the node is used;
+    # a cached schema keeps the unparsed properties, so that later runs
+    # parse them on first use too
+    schema = _parseDictionary(dict_file)
+    if cache:
+        cache.store(key, {"key": key, "schema": schema})
+    return schema
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the AGDR dictionaries, e.g. at packaging time")
+    parser.add_argument("-d", "--dictionary", help="path to the Gen3 dictionary JSON, all bundled dictionaries by default", required=False)
+    parser.add_argument("-o", "--output", help="path of the compiled artifact, next to the dictionary by default", required=False)
+    args = parser.parse_args()
+    if args.output and not args.dictionary:
+        parser.error("--output needs --dictionary")
+    dict_files = [args.dictionary] if args.dictionary else [dictionaryFile(v) for v in DICTIONARIES]
+    for dict_file in dict_files:
+        print(f"compiled dictionary written to {buildCompiledDictionary(dict_file, args.output)}")
@@ -3,8 +3,16 @@ This file provides the version of the package, in the format:
     major.minor.spreadsheetVersion.agdrDictionaryVersion
 '''
 
-def version(spreadsheet=None):
+VALIDATOR_VERSION = "1.3"
+
+# the dictionary used when the template version does not select another,
+# see agdrvalidator.data.dictionaries.agdrdictionary
+DEFAULT_DICTIONARY_VERSION = "2025_01_24"
+
+def version(spreadsheet=None, dictionary=None):
     if not spreadsheet:
         spreadsheet = "unknown"
-    nesi_version = f"1.3.{spreadsheet}.2025_01_24"
+    if not dictionary:
+        dictionary = DEFAULT_DICTIONARY_VERSION
+    nesi_version = f"{VALIDATOR_VERSION}.{spreadsheet}.{dictionary}"
     return nesi_version
@@ -69,39 +69,57 @@ class Gen3(Parser):
         self._schema.setRoot(root)
         return root
 
+    def _indexChildren(self):
+        '''
+        build a Gen3 node for every remaining dictionary entry, parsing
+        its links exactly once, and index the nodes by the node ids
+        their parent links point to
+
+        returns target node id -> list of child nodes, in dictionary order
+        '''
+        children = {}
+        for key in self._gen3Dictionary:
+            candidate = node.Gen3(self._gen3Dictionary[key], self._gen3Dictionary[key]["id"])
+            targets = []
+            for parent_link in candidate.getParentLinks():
+                if parent_link.node_id not in targets:
+                    targets.append(parent_link.node_id)
+            for target in targets:
+                children.setdefault(target, []).append((key, candidate))
+        return children
+
     def parse(self):
         root = self._extractRoot()
         self._schema.setRoot(root)
+        children = self._indexChildren()
         current_depth = [root]
         next_depth = []
 
+        # a node is placed (and its properties parsed) at the first
+        # depth where one of its parents is found, i.e. in the same
+        # breadth first order as walking the dictionary from the root;
+        # links to parents that were placed before it are made when it
+        # is placed, links to parents placed after it are made when
+        # the parent is placed
         with alive_bar(title="\tLoading data dictionary ") as bar:
             while current_depth != []:
                 for current_node in current_depth:
                     self._schema.nodes[current_node.name] = current_node
-                    for potential_child in list(self._gen3Dictionary):
-                        pchild_node = node.Gen3(self._gen3Dictionary[potential_child], self._gen3Dictionary[potential_child]["id"])
-                        logger.debug(f"_____checking node: [____{pchild_node.name}____] with potential parent: {current_node.name}")
-                        if pchild_node.isChildOf(current_node):
-                            logger.debug(f"found child of {current_node.name}: {pchild_node.name}")
-
-                            logger.debug(f"_____{pchild_node.name}______")
-                            pchild_node.parse_properties(self._gen3Dictionary[potential_child]["properties"], self._gen3Dictionary[potential_child]["required"], self._schema._terms, self._schema._definitions, self._schema._settings)
+                    for key, pchild_node in children.get(current_node.name, []):
+                        if key not in self._gen3Dictionary:
+                            # placed already, under another parent
                             current_node.addChild(pchild_node)
                             pchild_node.addParent(current_node)
-                            next_depth.append(pchild_node)
-                            self._gen3Dictionary.pop(potential_child)
-                            bar()
+                            continue
+                        logger.debug(f"found child of {current_node.name}: {pchild_node.name}")
+                        pchild_node.deferProperties(self._gen3Dictionary[key]["properties"], self._gen3Dictionary[key]["required"], self._schema._terms, self._schema._definitions, self._schema._settings, self._schema.getResolver())
+                        current_node.addChild(pchild_node)
+                        pchild_node.addParent(current_node)
+                        next_depth.append(pchild_node)
+                        self._gen3Dictionary.pop(key)
+                        bar()
                 else:
                     current_depth = next_depth
                     next_depth = []
 
-            # do some post processing; 
-            # some parent / child relationships may have been skipped over
-            for n in self._schema.nodes.values():
-                for parent_link in n.getParentLinks():
-                    n.addParent(self._schema.nodes[parent_link.node_id])
-                    self._schema.nodes[parent_link.node_id].addChild(n)
-                    bar()
-
-        return self._schema
\ No newline at end of file
+        return self._schema
@@ -4,8 +4,11 @@ templates are currently versioned. This file is for the 2024-08-28 version
 of the AGDR metadata template, which corresponds to the 2024-09-10 version 
 of the AGDR metadata dictionary.
 '''
+import contextlib
 import datetime
+import io
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
 import openpyxl
 import pandas as pd
@@ -13,6 +16,9 @@ from alive_progress import alive_bar
 
 from agdrvalidator import AgdrFormatException, BadMetadataSpreadsheetException
 from agdrvalidator.parser import *
+from agdrvalidator.parser.excel.anchorindex import AnchorIndex
+from agdrvalidator.parser.excel.layoutprofile import LayoutProfile
+from agdrvalidator.parser.excel.sheetcache import SheetCache
 from agdrvalidator.schema.agdrspreadsheet_validator import \
     AGDRSpreadsheetValidator
 from agdrvalidator.utils import logger
@@ -23,24 +29,82 @@ logger = logger.setUp(__name__)
 
 
 class Agdr(Parser):
-    def __init__(self, datapath, project):
+    def __init__(self, datapath, project, jobs=1, cache=None):
         self.datapath = datapath
+        self.project = project
+        self.jobs = jobs # number of worker processes used to parse tabs
+        self.cache = cache # ParseCache, or None to always parse
         self.tabs = ["project",
                      "experiments_genomic",
                      "experiments_metagenomic",
                      "samples",
                      "files_instruments",
                      "NeSI_internal_use"]
-        self.pyxl     = self._open_pyxl() # openpyxl workbook
-        self.pd_excel = self._open_book() # pandas excel file
+        # tabs that grow with the submission are read row by row
+        # instead of being decoded as a whole
+        self.streamed_tabs = ["samples",
+                              "files_instruments"]
+        self.anchors = {} # tab name -> AnchorIndex of its first column
         self.required_color = 'FFD9EAD3'
-        self.version = self._parse_nesi_internal_use()
         # dictionary of node name -> SpreadsheetNode object
         self.nodes = {}
         self.asv = AGDRSpreadsheetValidator()
+        self.warnings = [] # warnings printed while parsing
+        self.workbook = None
+        self.sheet_cache = None
+        self.cache_key = None
+        self.layout = None # LayoutProfile of the template version, if cached
+        self.cached = self._load_cached()
+        if self.cached:
+            # the workbook is not opened at all
+            self.version = self.cached["version"]
+        else:
+            self.workbook = self._open_workbook() # read-only openpyxl workbook
+            self.sheet_cache = SheetCache(self.workbook, self.streamed_tabs) # each tab is decoded once
+            self.version = self._parse_nesi_internal_use()
+            if self.cache:
+                self.layout = LayoutProfile.load(self.cache, self.version)
         self.spreadsheet_report_output = f"{project}_spreadsheet_validation_report_{datetime.datetime.now().strftime('%Y-%m-%d')}.txt"
 
 
+    def _load_cached(self):
+        '''
+        result of an earlier parse of the same workbook, if there is one
+        '''
+        if not self.cache:
+            return None
+        self._open_excel_helper()
+        self.cache_key = self.cache.key(self.datapath)
+        return self.cache.load(self.cache_key)
+
+    def _store_cached(self):
+        if not self.cache:
+            return
+        self.cache.store(self.cache_key, {
+            "version": self.version,
+            "nodes": self.nodes,
+            "headers": self.asv.headers,
+            "warnings": self.warnings,
+        })
+
+    def _warn(self, message):
+        print(message)
+        self.warnings.append(message)
+
+    def anchor_index(self, sheet_name) -> AnchorIndex:
+        '''
+        index of the section titles and table markers ("Field",
+        "Example input", "Your input") in the first column of a tab,
+        built once per tab
+
+        useful for debugging templates whose layout has drifted from
+        what the parser expects
+        '''
+        if sheet_name not in self.anchors:
+            column = self.sheet_cache.column(sheet_name)
+            self.anchors[sheet_name] = AnchorIndex(sheet_name, column)
+        return self.anchors[sheet_name]
+
     def _seek(self, sheet_name, text):
         '''
         helper method for finding a "table" within a sheet, like 
@@ -50,15 +114,11 @@ class Agdr(Parser):
         # want to return row number, so the callee knows
         # where to start parsing
         try:
-            sheet = pd.read_excel(self.pd_excel, sheet_name)
-            rows, _ = sheet.shape
-            for r in range(rows):
-                cell_text = str(sheet.loc[r].iat[0]).strip()
-                if cell_text.lower() == text.lower():
-                    return r
-            else:
+            r = self.anchor_index(sheet_name).find(text)
+            if r is None:
                 e = f"Could not find {text} in sheet"
                 raise BadMetadataSpreadsheetException(e)
+            return r
         except Exception as e:
             print(f"An error occurred while analysis the spreadsheet: {e} {sheet_name}. Please make sure that no sections are deleted from the original template even if unused and that they have not been renamed.")
             sys.exit(1)
@@ -73,27 +133,20 @@ class Agdr(Parser):
         must return a SpreadsheetRow object
         '''
         try:
-            sheet = pd.read_excel(self.pd_excel, sheet_name)
-            rows, _ = sheet.shape
             text = "Field"
-            row = None
-            for row in range(startrow, rows):
-                cell_text = str(sheet.loc[row].iat[0]).strip()
-                if cell_text.lower() == text.lower():
-                    break
-            else:
+            row = self.anchor_index(sheet_name).find(text, startrow)
+            if row is None:
                 e = f"Could not find {text} in sheet"
                 raise BadMetadataSpreadsheetException(e)
 
             # extract all entries in the current row
             data = []
-            fields = list(sheet.loc[row].dropna().values)
+            fields = [value for value in self.sheet_cache.row(sheet_name, row) if pd.notna(value)]
             for i in range(1, len(fields)):
                 fields[i] = fields[i].strip()
                 # cell position is row, i+1
                 cl = CellLocation(row+2, i+1)
-                cell = self.pyxl[sheet_name][str(cl)]
-                fill_color = cell.fill.start_color.index
+                fill_color = self.sheet_cache.fill_color(sheet_name, row, i)
                 required = self.required_color == fill_color
                 sp = SpreadsheetProperty(fields[i], None, cl, required)
                 data.append(sp)
@@ -108,72 +161,118 @@ class Agdr(Parser):
         helper method for extracting data for a particular node
         '''
         try:
-            sheet = pd.read_excel(self.pd_excel, sheet_name)
-            headers = self._seek_fields(sheet_name, startrow)
-            self.asv.add(node_name, headers)
-            self.headers = headers
             sections_mapping = {
                 "raw",
                 "sample",
                 "experiment"
             }
-            rows, _ = sheet.shape
             text = "Your input"
             text2 = "Example input"
-            data = []
-            datastart = None
-            for r in range(startrow, rows):
-                cell_text = str(sheet.loc[r].iat[0]).strip()
-                if cell_text.lower() == text.lower():
-                    datastart = r
-                    if r - 1 > 0:
-                        cell_text2 = str(sheet.loc[r-1].iat[0]).strip()
-                        if cell_text2.lower() != text2.lower():
-                            print(f"**************WARNING************ \n"
-                                  f"Please make sure that \"{text}\" is on at least the first row of a table that needs to be ingested in {sheet_name} tab "
-                                  f"otherwise rows will be missed \n"
-                                  f"**************WARNING************ \n")
-                    if node_name in sections_mapping and r > 10:
-                        print(f"**************WARNING************ \n"
-                            f"Please make sure that \"{text}\" is on at least the first row of a table {node_name} that needs to be ingested in {sheet_name} tab "
-                            f"otherwise rows will be missed \n"
-                            f"**************WARNING************ \n")
-                    break
+            profiled = self._seek_profiled(sheet_name, startrow, node_name)
+            if profiled:
+                headers, datastart, anchors = profiled
             else:
-                if datastart == None:
+                anchors = self.anchor_index(sheet_name)
+                headers = self._seek_fields(sheet_name, startrow)
+                datastart = anchors.find(text, startrow)
+                if datastart is None:
                     e = f"Could not find {text} in sheet"
                     raise BadMetadataSpreadsheetException(e)
-
-            # now extract all rows of data until the row is empty
-            for r in range(datastart, rows):
-                row = list(sheet.loc[r].values)[1:]
-                row = row[:len(headers.data)]
-                logger.debug(f"row: {row}")
-
-                if pd.isna(row).all() or not row:
-                    break
-
-                sp = None
-                spreadsheet_rows = []
-                for index, value in enumerate(row):
-                    logger.debug(f"r: {r}, index: {index}")
-                    cl = CellLocation(r+2, index+2)
-                    pyxl_sheet = self.pyxl[sheet_name]
-                    cell = pyxl_sheet[str(cl)]
-                    logger.debug(cell)
-                    logger.debug(cell.value)
-                    name = headers[index].name
-                    required = headers[index].required
-                    sp = SpreadsheetProperty(name, value, cl, required)
-                    spreadsheet_rows.append(sp)
-                else:
-                    sr = SpreadsheetRow(spreadsheet_rows, sheet_name)
-                    data.append(sr)
-            return data
+                self._record_layout(sheet_name, startrow, node_name, headers, datastart)
+            self.asv.add(node_name, headers)
+            self.headers = headers
+            r = datastart
+            if r - 1 > 0:
+                if not anchors.is_at(text2, r-1):
+                    self._warn(f"**************WARNING************ \n"
+                          f"Please make sure that \"{text}\" is on at least the first row of a table that needs to be ingested in {sheet_name} tab "
+                          f"otherwise rows will be missed \n"
+                          f"**************WARNING************ \n")
+            if node_name in sections_mapping and r > 10:
+                self._warn(f"**************WARNING************ \n"
+                    f"Please make sure that \"{text}\" is on at least the first row of a table {node_name} that needs to be ingested in {sheet_name} tab "
+                    f"otherwise rows will be missed \n"
+                    f"**************WARNING************ \n")
+
+            return list(self._iter_data(sheet_name, datastart, headers))
         except Exception as e:
             print(f"An error occurred while analysis the spreadsheet: {e} {sheet_name}. Please make sure that no sections are deleted from the original template even if unused and that they have not been renamed.. Around row {startrow}.")
             sys.exit(1)
 
+    def _seek_profiled(self, sheet_name, startrow, node_name):
+        '''
+        headers and first data row of a table, taken from the layout
+        profile of the template version, or None if there is no profile
+        for the table or the workbook does not match it
+
+        also returns an AnchorIndex covering (at least) the rows from
+        the top of the tab to the first data row
+        '''
+        table = self.layout.get(sheet_name, node_name) if self.layout else None
+        if not table:
+            return None
+        field = startrow + table["field"]
+        datastart = startrow + table["data"]
+        if sheet_name in self.anchors or sheet_name not in self.streamed_tabs:
+            anchors = self.anchor_index(sheet_name)
+        else:
+            # only read as much of a streamed tab as the profile needs
+            column = self.sheet_cache.column(sheet_name, stop=datastart + 1)
+            anchors = AnchorIndex(sheet_name, column)
+        # the profile must point at the same rows discovery would find
+        if anchors.find("Field", startrow) != field or anchors.find("Your input", startrow) != datastart:
+            logger.info(f"layout profile does not match {sheet_name}/{node_name}, discovering layout")
+            return None
+        fields = [value for value in self.sheet_cache.row(sheet_name, field) if pd.notna(value)][1:]
+        names = [name for name, _ in table["headers"]]
+        if not all(isinstance(value, str) for value in fields) or [value.strip() for value in fields] != names:
+            logger.info(f"layout profile headers do not match {sheet_name}/{node_name}, discovering layout")
+            return None
+        # which headers are required can change without the names changing
+        required = [self.required_color == self.sheet_cache.fill_color(sheet_name, field, i) for i in range(1, len(fields) + 1)]
+        if required != [flag for _, flag in table["headers"]]:
+            logger.info(f"layout profile required headers do not match {sheet_name}/{node_name}, discovering layout")
+            return None
+        data = [
+            SpreadsheetProperty(name, None, CellLocation(field+2, i+1), required)
+            for i, (name, required) in enumerate(table["headers"], start=1)
+        ]
+        return SpreadsheetRow(data, sheet_name), datastart, anchors
+
+    def _record_layout(self, sheet_name, startrow, node_name, headers, datastart):
+        if self.layout is None:
+            return
+        field = self.anchor_index(sheet_name).find("Field", startrow)
+        self.layout.record(sheet_name, node_name,
+                           field - startrow,
+                           datastart - startrow,
+                           [(header.name, header.required) for header in headers])
+
+    def _iter_data(self, sheet_name, datastart, headers):
+        '''
+        generator of the rows of data of a table, as SpreadsheetRow
+        objects, from datastart until the first empty row
+
+        rows are read from the sheet one at a time, so for streamed
+        tabs nothing after the end of the table is ever read
+        '''
+        rows = self.sheet_cache.rows(sheet_name, datastart, len(headers.data))
+        # all rows of the table share one name -> position index
+        index = SpreadsheetRow.build_index(headers)
+        # whole rows are read at once, and cell locations are computed
+        # from the row and column indices, so no cell objects are needed
+        for r, row in enumerate(rows, start=datastart):
+            logger.debug("row %s: %s", r+2, row)
+
+            if pd.isna(row).all() or not row:
+                break
+
+            spreadsheet_rows = [
+                SpreadsheetProperty(header.name, value, CellLocation(r+2, index+2), header.required)
+                for index, (header, value) in enumerate(zip(headers, row))
+            ]
+            yield SpreadsheetRow(spreadsheet_rows, sheet_name, index)
+        rows.close()
 
     def _parse_project(self): 
         tab_name = "project"
@@ -294,21 +393,21 @@ class Agdr(Parser):
         '''
         tab_name = "NeSI_internal_use"
         # open the sheet
-        sheet = pd.read_excel(self.pd_excel, tab_name)
+        sheet = self.sheet_cache.get(tab_name)
         rows, _ = sheet.shape
         version_string = None
 
         skipped_empty_lines = False
         for r in range(rows):
             # if row is empty, skip
-            if pd.isna(sheet.loc[r].iat[0]):
+            if pd.isna(sheet[r, 0]):
                 if skipped_empty_lines:
                     return version_string
                 else: continue
             else:
                 skipped_empty_lines = True
             
-            version_string = str(sheet.loc[r].iat[0]).strip()
+            version_string = str(sheet[r, 0]).strip()
         return version_string
 
     def _parse_tab(self, tab_name):
@@ -334,13 +433,18 @@ class Agdr(Parser):
         if not str(extension).lower() == "xlsx":
             raise Exception("File extension must be .xlsx")
 
-    def _open_pyxl(self):
+    def _open_workbook(self):
+        '''
+        the workbook is opened once, in read-only mode; cell values and
+        the header fill colours are both read from it by self.sheet_cache
+        '''
         self._open_excel_helper()
-        return openpyxl.load_workbook(self.datapath)
+        return openpyxl.load_workbook(self.datapath, read_only=True, data_only=True, keep_links=False)
 
-    def _open_book(self):
-        self._open_excel_helper()
-        return pd.ExcelFile(self.datapath)
+    def close(self):
+        # read-only workbooks keep the file open until closed
+        if self.workbook is not None:
+            self.workbook.close()
 
     def parse_old(self):
         with alive_bar(title="\tParsing AGDR spreadsheet", length=len(self.tabs)) as bar:
@@ -350,6 +454,39 @@ class Agdr(Parser):
                 self.nodes.update(self._parse_tab(tabName))
                 bar()
 
+    def _parse_in_workers(self, update_nodes):
+        '''
+        parse each tab in its own worker process
+
+        results are merged in the order of self.tabs, whatever order
+        the workers finish in, so the parsed nodes (and anything printed
+        while parsing a tab) come out the same as a sequential parse
+        '''
+        workers = min(self.jobs, len(self.tabs))
+        logger.info(f"parsing {len(self.tabs)} tabs with {workers} worker processes")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_parse_tab_in_worker, self.datapath, self.project, tabName, self.layout)
+                for tabName in self.tabs
+            ]
+            with alive_bar(title="\tParsing AGDR spreadsheet", length=len(self.tabs)) as bar:
+                for tabName, future in zip(self.tabs, futures):
+                    logger.debug(f"tabName: {tabName}")
+                    nodes, headers, warnings, layout, output, exit_code = future.result()
+                    if exit_code:
+                        print(output, end="")
+                        for remaining in futures:
+                            remaining.cancel()
+                        sys.exit(exit_code)
+                    for warning in warnings:
+                        self._warn(warning)
+                    update_nodes(nodes)
+                    if self.layout and layout:
+                        self.layout.update(layout)
+                    for node_name, header in headers.items():
+                        self.asv.add(node_name, header)
+                    bar()
+
     def parse(self):
         def update_nodes(parsed_data):
             for key in parsed_data:
@@ -359,11 +496,49 @@ class Agdr(Parser):
                 else:
                     # add the key-value pair to the dictionary
                     self.nodes[key] = parsed_data[key]
-        with alive_bar(title="\tParsing AGDR spreadsheet", length=len(self.tabs)) as bar:
-            for index, tabName in enumerate(self.tabs):
-                logger.debug(f"tabName: {tabName}")
-                logger.debug(f"index: {index}")
-                update_nodes(self._parse_tab(tabName))
-                bar()
+        if self.cached:
+            print("\tParsing AGDR spreadsheet: unchanged since last run, using cached result")
+            self.nodes = self.cached["nodes"]
+            for node_name, header in self.cached["headers"].items():
+                self.asv.add(node_name, header)
+            for warning in self.cached["warnings"]:
+                print(warning)
+            self.asv.validate(self.spreadsheet_report_output)
+            return
+        if self.jobs > 1:
+            self._parse_in_workers(update_nodes)
+        else:
+            with alive_bar(title="\tParsing AGDR spreadsheet", length=len(self.tabs)) as bar:
+                for index, tabName in enumerate(self.tabs):
+                    logger.debug(f"tabName: {tabName}")
+                    logger.debug(f"index: {index}")
+                    update_nodes(self._parse_tab(tabName))
+                    bar()
+        logger.info(f"sheet cache: {self.sheet_cache.decodes} sheets decoded, {self.sheet_cache.decodes_saved} decodes saved")
+        self.close()
+        if self.layout:
+            self.layout.save(self.cache)
+        self._store_cached()
         self.asv.validate(self.spreadsheet_report_output)
 
+
+def _parse_tab_in_worker(datapath, project, tab_name, layout=None):
+    '''
+    parse a single tab of a workbook, in a worker process started by
+    Agdr.parse() when more than one job is requested
+
+    returns the parsed nodes, spreadsheet headers, warnings and layout
+    profile of the tab, along with anything printed while parsing it and the exit code
+    if parsing failed, so that the parent process can report them in
+    tab order
+    '''
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            parser = Agdr(datapath, project)
+            parser.layout = layout
+            nodes = parser._parse_tab(tab_name)
+            parser.close()
+        except SystemExit as e:
+            return {}, {}, [], None, output.getvalue(), e.code or 0
+    return nodes, parser.asv.headers, parser.warnings, parser.layout, output.getvalue(), 0
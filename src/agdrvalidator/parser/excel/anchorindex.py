@@ -0,0 +1,91 @@
+'''
+This file provides an index of the text in the first column of a sheet
+of the AGDR metadata template.
+
+The first column holds the markers the parser navigates by: section
+titles ("Project Information", "Datasets", "Contributors", ...) and the
+"Field", "Example input" and "Your input" rows of each table. The index
+is built in a single pass over that column, so that finding a section,
+or the first marker of a given kind after a section, does not rescan
+the sheet.
+'''
+from bisect import bisect_left
+
+import pandas as pd
+
+from agdrvalidator.utils import logger
+
+logger = logger.setUp(__name__)
+
+
+def _key(value):
+    # markers are matched the same way the parser always matched them
+    return str(value).strip().lower()
+
+
+class AnchorIndex(object):
+    '''
+    Maps the text of every non-empty cell in the first column of a sheet
+    to the (sorted) rows it appears in.
+
+    Rows are indices into the sheet as handed out by SheetCache, and
+    text is matched case-insensitively, ignoring surrounding whitespace.
+    '''
+    def __init__(self, sheet_name, column):
+        self.sheet_name = sheet_name
+        self._rows = {} # marker text -> sorted list of rows
+        for row, value in enumerate(column):
+            if pd.notna(value):
+                self._rows.setdefault(_key(value), []).append(row)
+        logger.debug(f"anchor index for {sheet_name}: {self}")
+
+    def rows(self, text):
+        '''
+        all rows with the given text, in order
+        '''
+        return tuple(self._rows.get(_key(text), ()))
+
+    def find(self, text, start=0):
+        '''
+        first row at or after start with the given text, or None
+        '''
+        rows = self._rows.get(_key(text), ())
+        i = bisect_left(rows, start)
+        if i < len(rows):
+            return rows[i]
+        return None
+
+    def is_at(self, text, row):
+        '''
+        True if the given text is in the given row
+        '''
+        return self.find(text, row) == row
+
+    def markers(self):
+        '''
+        dictionary of marker text -> rows it appears in, for inspecting
+        how the layout of a template differs from what the parser expects
+        '''
+        return {text: list(rows) for text, rows in self._rows.items()}
+
+    def __contains__(self, text):
+        return _key(text) in self._rows
+
+    def __str__(self):
+        # runs of consecutive rows (e.g. "your input") are shown as ranges
+        markers = []
+        for text, rows in sorted(self._rows.items(), key=lambda item: item[1][0]):
+            spans = []
+            first = last = rows[0]
+            for row in rows[1:]:
+                if row != last + 1:
+                    spans.append(f"{first}" if first == last else f"{first}-{last}")
+                    first = row
+                last = row
+            spans.append(f"{first}" if first == last else f"{first}-{last}")
+            label = text if len(text) <= 40 else text[:37] + "..."
+            markers.append(f"{label!r}: {','.join(spans)}")
+        return f"AnchorIndex({self.sheet_name}, {{{'; '.join(markers)}}})"
+
+    def __repr__(self):
+        return self.__str__()
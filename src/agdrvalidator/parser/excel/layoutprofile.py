@@ -0,0 +1,83 @@
+'''
+This file provides the layout profile of a version of the AGDR metadata
+template.
+
+Every workbook made from the same version of the template has the same
+tables, with the same headers, the same required (green) headers, and
+the same distance between the title of a table, its "Field" row and its
+first "Your input" row. Once the layout of a table has been discovered
+in one workbook, it is kept in the parse cache, keyed by the template
+version found in the NeSI_internal_use tab, so that parsing the next
+workbook of that version does not need to scan a whole streamed tab to
+find where a table starts.
+
+A profile is only a hint: the parser checks it against the workbook
+(the anchor rows, the header names and the fill of the header row),
+and discovers the layout from scratch when it does not match.
+'''
+from agdrvalidator.utils import logger
+
+logger = logger.setUp(__name__)
+
+
+class LayoutProfile(object):
+    '''
+    Layout of each table of one version of the template.
+
+    Tables are keyed by tab name and node name. For each table, rows
+    are stored relative to the row the parser starts looking from (the
+    row of the title of the table, or the top of the tab):
+        field   -- offset of the "Field" row
+        data    -- offset of the first "Your input" row
+        headers -- list of (header name, required) pairs
+    '''
+    def __init__(self, version, tables=None):
+        self.version = version
+        self.tables = tables if tables is not None else {}
+        self.changed = False # whether there is anything new to save
+
+    @classmethod
+    def load(cls, cache, version):
+        tables = cache.load(cls._key(cache, version))
+        logger.debug(f"layout profile for template {version}: {'found' if tables else 'not found'}")
+        return cls(version, tables)
+
+    @classmethod
+    def _key(cls, cache, version):
+        return cache.named_key("layout", version)
+
+    def save(self, cache):
+        if self.changed:
+            cache.store(self._key(cache, self.version), self.tables)
+            self.changed = False
+
+    def get(self, tab_name, node_name):
+        return self.tables.get(f"{tab_name}/{node_name}")
+
+    def record(self, tab_name, node_name, field, data, headers):
+        table = {
+            "field": field,
+            "data": data,
+            "headers": [(name, required) for name, required in headers],
+        }
+        key = f"{tab_name}/{node_name}"
+        if self.tables.get(key) != table:
+            logger.debug(f"layout profile for template {self.version}: recording {key}")
+            self.tables[key] = table
+            self.changed = True
+
+    def update(self, other):
+        '''
+        take the tables recorded in another profile of the same template,
+        e.g. by a worker process
+        '''
+        for key, table in other.tables.items():
+            if self.tables.get(key) != table:
+                self.tables[key] = table
+                self.changed = True
+
+    def __str__(self):
+        return f"LayoutProfile(version={self.version}, tables={sorted(self.tables)})"
+
+    def __repr__(self):
+        return self.__str__()
@@ -0,0 +1,240 @@
+'''
+This file provides a cache of decoded worksheets for a single excel
+workbook. Each tab of the AGDR metadata template holds several tables,
+and the parser looks up the same tab many times while searching for
+each table, its headers and its data. Decoding a tab from the xlsx XML
+is by far the most expensive part of parsing, so it is done only once
+per tab, and every later lookup is served from memory.
+
+The workbook is read with openpyxl alone, in read-only mode, and only
+cell values are decoded (no cell objects are built). The fill colours
+of the "Field" (header) rows are the only style information the parser
+needs; they are read separately, one header row at a time, the first
+time they are asked for. Cell values are converted the same way
+pandas.read_excel() converts them, so that the rest of the parser sees
+exactly what it saw when the workbook was read through pandas.
+
+Tabs that grow with the size of a submission (samples, files) can be
+marked as streamed. Those are never decoded as a whole: only their
+first column is kept, to find where each table starts, header rows are
+read one at a time, and data rows are read from the worksheet XML one
+row at a time, for as long as the caller keeps asking for them.
+'''
+import numpy as np
+from openpyxl.cell.cell import ERROR_CODES
+
+from agdrvalidator.utils import logger
+
+logger = logger.setUp(__name__)
+
+# strings that pandas.read_excel() treats as missing values by default
+NA_STRINGS = frozenset([
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None",
+    "n/a", "nan", "null"
+])
+
+
+
+def convert_value(value):
+    '''
+    convert an openpyxl cell value to the value pandas.read_excel() would give
+
+    error cells (e.g. #DIV/0!) are read as their error code, and
+    become missing values, like they do in pandas
+    '''
+    if value is None:
+        return np.nan
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        if int(value) == value:
+            return int(value)
+        return float(value)
+    if isinstance(value, str) and (value in NA_STRINGS or value in ERROR_CODES):
+        return np.nan
+    return value
+
+
+class SheetCache(object):
+    '''
+    Decodes each sheet of a workbook exactly once, on first use.
+
+    Sheets are handed out as read-only 2D numpy object arrays, indexed
+    the same way as a pandas DataFrame read with pandas.read_excel(),
+    i.e. the first row of the worksheet is treated as a header, and
+    sheet[0, 0] is the first column of the second row of the worksheet.
+    They are shared between all callers, which is why they are
+    not writeable.
+
+    column(), row() and rows() use the same row indices, and work for
+    both decoded and streamed sheets; get() is only for decoded sheets.
+    '''
+    def __init__(self, workbook, streamed=()):
+        self._workbook = workbook # read-only openpyxl workbook
+        self._streamed = set(streamed) # sheets that are never decoded whole
+        self._sheets = {}   # sheet name -> read-only array of cell values
+        self._columns = {}  # streamed sheet name -> first column
+        self._rows = {}     # sheet name -> row -> values of a row read on its own
+        self._fills = {}    # sheet name -> row -> fill colours of a row read on its own
+        self.decodes = 0    # number of passes over a worksheet
+        self.lookups = 0    # number of times a sheet was asked for
+
+    def get(self, sheet_name):
+        if sheet_name in self._streamed:
+            raise ValueError(f"{sheet_name} is streamed, it can not be decoded as a whole")
+        self.lookups += 1
+        return self._sheet(sheet_name)
+
+    def column(self, sheet_name, stop=None):
+        '''
+        the first column of a sheet, as a read-only 1D array
+
+        if stop is given, only rows before stop are needed; for a
+        streamed sheet that has not been decoded yet, only those
+        rows are read from the worksheet
+        '''
+        self.lookups += 1
+        if sheet_name not in self._streamed:
+            return self._sheet(sheet_name)[:stop, 0]
+        if sheet_name in self._columns:
+            return self._columns[sheet_name][:stop]
+        if stop is not None:
+            return self._decode_column(sheet_name, stop)
+        self._columns[sheet_name] = self._decode_column(sheet_name)
+        return self._columns[sheet_name]
+
+    def row(self, sheet_name, row):
+        '''
+        all values of a single row, as a list
+        '''
+        self.lookups += 1
+        if sheet_name not in self._streamed:
+            return list(self._sheet(sheet_name)[row])
+        if row not in self._rows.get(sheet_name, {}):
+            self._decode_row(sheet_name, row)
+        return list(self._rows[sheet_name][row])
+
+    def rows(self, sheet_name, start, width):
+        '''
+        generator of the values in columns 1 to width (inclusive) of
+        each row, from row start onwards
+
+        for a streamed sheet, rows are read from the worksheet only as
+        they are asked for, so a caller that stops early (e.g. at the
+        first empty row) never reads the rest of the sheet
+        '''
+        self.lookups += 1
+        if sheet_name not in self._streamed:
+            sheet = self._sheet(sheet_name)
+            for r in range(start, sheet.shape[0]):
+                yield list(sheet[r, 1:width + 1])
+            return
+
+        logger.debug(f"streaming sheet: {sheet_name} from row {start}")
+        self.decodes += 1
+        worksheet = self._worksheet(sheet_name)
+        # +2: 1-based worksheet rows, and the dropped worksheet header row
+        for values in worksheet.iter_rows(min_row=start + 2, min_col=2, max_col=width + 1, values_only=True):
+            values = [convert_value(value) for value in values]
+            values.extend([np.nan] * (width - len(values)))
+            yield values
+
+    def _worksheet(self, sheet_name):
+        worksheet = self._workbook[sheet_name]
+        # the stored dimensions of a worksheet are not always correct,
+        # so read every row that is actually present
+        worksheet.reset_dimensions()
+        return worksheet
+
+    def _sheet(self, sheet_name):
+        if sheet_name not in self._sheets:
+            self._decode(sheet_name)
+        return self._sheets[sheet_name]
+
+    def fill_color(self, sheet_name, row, column):
+        '''
+        fill colour of a cell, or None if the cell has no fill
+
+        row and column are the same indices as for row(); the styles
+        of a row are read once, the first time they are asked for
+        '''
+        if row not in self._fills.get(sheet_name, {}):
+            self._decode_row(sheet_name, row)
+        fills = self._fills[sheet_name][row]
+        if column < len(fills):
+            return fills[column]
+        return None
+
+    def _decode(self, sheet_name):
+        logger.debug(f"decoding sheet: {sheet_name}")
+        worksheet = self._worksheet(sheet_name)
+
+        rows = []
+        last_row_with_data = -1
+        for values in worksheet.iter_rows(values_only=True):
+            # trim trailing empty cells
+            length = len(values)
+            while length and values[length - 1] is None:
+                length -= 1
+            if length:
+                last_row_with_data = len(rows)
+            rows.append([convert_value(value) for value in values[:length]])
+
+        # trim trailing empty rows, pad all rows to the same width
+        # and drop the worksheet header row
+        rows = rows[:last_row_with_data + 1]
+        width = max((len(values) for values in rows), default=0)
+        rows = rows[1:]
+        sheet = np.full((len(rows), width), np.nan, dtype=object)
+        for r, values in enumerate(rows):
+            sheet[r, :len(values)] = values
+        sheet.setflags(write=False)
+
+        self._sheets[sheet_name] = sheet
+        self.decodes += 1
+
+    def _decode_column(self, sheet_name, stop=None):
+        logger.debug(f"decoding first column of sheet: {sheet_name}, up to row {stop}")
+        worksheet = self._worksheet(sheet_name)
+        # +1: 1-based worksheet rows, and the dropped worksheet header row
+        max_row = stop + 1 if stop is not None else None
+        values = [
+            convert_value(values[0]) if values else np.nan
+            for values in worksheet.iter_rows(max_row=max_row, max_col=1, values_only=True)
+        ]
+        # drop the worksheet header row
+        column = np.array(values[1:] if values else [], dtype=object)
+        column.setflags(write=False)
+        self.decodes += 1
+        return column
+
+    def _decode_row(self, sheet_name, row):
+        logger.debug(f"decoding row {row} of sheet: {sheet_name}")
+        worksheet = self._worksheet(sheet_name)
+        cells = ()
+        for cells in worksheet.iter_rows(min_row=row + 2, max_row=row + 2):
+            break
+        length = len(cells)
+        while length and cells[length - 1].value is None:
+            length -= 1
+        cells = cells[:length]
+        self._rows.setdefault(sheet_name, {})[row] = [convert_value(cell.value) for cell in cells]
+        self._fills.setdefault(sheet_name, {})[row] = [
+            cell.fill.start_color.index if cell.fill is not None else None
+            for cell in cells
+        ]
+        self.decodes += 1
+
+    @property
+    def decodes_saved(self):
+        '''
+        number of sheet decodes avoided by serving a lookup from the cache
+        '''
+        return self.lookups - self.decodes
+
+    def __str__(self):
+        return f"SheetCache(sheets={len(self._sheets)}, streamed={len(self._streamed)}, decodes={self.decodes}, decodes_saved={self.decodes_saved})"
+
+    def __repr__(self):
+        return self.__str__()
@@ -14,6 +14,8 @@ from agdrvalidator.schema.agdrspreadsheet_validator import \
     AGDRSpreadsheetValidator
 from agdrvalidator.schema.base import *
 from agdrvalidator.schema.node.agdrnode import AGDR as AGDRNode
+from agdrvalidator.schema.node.agdrnode import DatasetIndex, SampleParents
+from agdrvalidator.schema.node.agdrmapping import FILE_TABLE_NODES
 from agdrvalidator.schema.node.property.agdrproperty import \
     AGDR as AGDRProperty
 from agdrvalidator.schema.node.property.gen3property import \
@@ -26,8 +28,10 @@ from agdrvalidator.utils.rich_tabular import *
 logger = logger.setUp(__name__)
 
 class AGDR(Schema):
-    def __init__(self, gen3_dictionary, spreadsheet_metadata: Dict[str, AGDRNode], report=None, project="AGDR99999", program="NZ"):
+    def __init__(self, gen3_dictionary, spreadsheet_metadata: Dict[str, AGDRNode], report=None, project="AGDR99999", program="NZ", population_cache=None):
         self._gen3_dictionary = gen3_dictionary
+        # PopulationCache of nodes populated in earlier runs, or None
+        self._population_cache = population_cache
         self.project_code = project
         self.program_name = program
 
@@ -115,36 +119,42 @@ class AGDR(Schema):
         node = "project"
         logger.debug(f"type of g3schema: {type(g3schema)}")
         logger.debug(f"type of g3schema.nodes: {type(g3schema.nodes)}")
-        self._nodes[node] = AGDRNode(node, raw_metadata[node], g3schema.nodes[node], project=self.project_code, program=self.program_name, outputfile=self.report_output)
+        self._nodes[node] = self._node(node, raw_metadata[node])
         self._root = self._nodes[node] # set root to project node
 
+        # the datasets of this workbook, by name, for the nodes that
+        # refer to a dataset by its name
+        datasets = DatasetIndex()
         node = "dataset"
-        self._nodes[node] = AGDRNode(node, raw_metadata[node], g3schema.nodes[node], project=self.project_code, program=self.program_name, outputfile=self.report_output)
+        self._nodes[node] = self._node(node, raw_metadata[node], datasets=datasets)
         node = "external_dataset"
-        self._nodes[node] = AGDRNode(node, raw_metadata[node], g3schema.nodes[node], project=self.project_code, program=self.program_name, outputfile=self.report_output)
+        self._nodes[node] = self._node(node, raw_metadata[node])
         node = "contributor"
-        self._nodes[node] = AGDRNode(node, raw_metadata[node], g3schema.nodes[node], project=self.project_code, program=self.program_name, outputfile=self.report_output)
+        self._nodes[node] = self._node(node, raw_metadata[node], datasets=datasets)
         node = "experiment"
-        self._nodes[node] = AGDRNode(node, raw_metadata[node], g3schema.nodes[node], project=self.project_code, program=self.program_name, outputfile=self.report_output)
+        self._nodes[node] = self._node(node, raw_metadata[node], datasets=datasets)
         node = "genome"
-        self._nodes[node] = AGDRNode(node, raw_metadata[node], g3schema.nodes[node], project=self.project_code, program=self.program_name, outputfile=self.report_output)
+        self._nodes[node] = self._node(node, raw_metadata[node])
         node = "metagenome"
-        self._nodes[node] = AGDRNode(node, raw_metadata[node], g3schema.nodes[node], project=self.project_code, program=self.program_name, outputfile=self.report_output)
+        self._nodes[node] = self._node(node, raw_metadata[node])
 
         # need to pass in the submitter_id from the genome and metagenome tables
         # specifically for the sample table
-        sample_parents = {}
-        sample_parents["genome"] = [prop.data for prop in self._nodes["genome"].getProperties("submitter_id")]
-        sample_parents["metagenome"] = [prop.data for prop in self._nodes["metagenome"].getProperties("submitter_id")]
+        sample_parents = SampleParents(
+            genomes=[prop.data for prop in self._nodes["genome"].getProperties("submitter_id")],
+            metagenomes=[prop.data for prop in self._nodes["metagenome"].getProperties("submitter_id")],
+        )
 
         node = "sample"
-        self._nodes[node] = AGDRNode(node, raw_metadata[node], g3schema.nodes[node], project=self.project_code, program=self.program_name, parents=sample_parents, outputfile=self.report_output)
+        self._nodes[node] = self._node(node, raw_metadata[node], parents=sample_parents)
 
         # some nodes are mushed into a single table in the metadata
         # so, split data out from "file" table from excel
         node = "publication"
-        dataset_pubs = AGDRNode(node, raw_metadata["dataset"], g3schema.nodes[node], project=self.project_code, program=self.program_name, outputfile=self.report_output)
-        external_dataset_pubs = (AGDRNode(node, raw_metadata["external_dataset"], g3schema.nodes[node], project=self.project_code, program=self.program_name, outputfile=self.report_output))
+        dataset_pubs = self._node(node, raw_metadata["dataset"], datasets=datasets)
+        # without any dataset, populating the publications of external
+        # datasets prints a warning, so they are not reused
+        external_dataset_pubs = self._node(node, raw_metadata["external_dataset"], datasets=datasets, reuse=bool(datasets.datasets))
         if dataset_pubs and dataset_pubs.data and external_dataset_pubs and external_dataset_pubs.data:
             dataset_pubs.data.extend(external_dataset_pubs.data)
             self._nodes[node] = dataset_pubs
@@ -156,23 +166,68 @@ class AGDR(Schema):
         # TODO: indigenous_governance
         # TODO: iwi
 
-        node = "genomics_assay"
-        self._nodes[node] = AGDRNode(node, raw_metadata["file"], g3schema.nodes[node], project=self.project_code, program=self.program_name, outputfile=self.report_output)
-        node = "aligned_reads_index"
-        self._nodes[node] = AGDRNode(node, raw_metadata["file"], g3schema.nodes[node], project=self.project_code, program=self.program_name, outputfile=self.report_output)
-        node = "raw"
-        self._nodes[node] = AGDRNode(node, raw_metadata["file"], g3schema.nodes[node], project=self.project_code, program=self.program_name, outputfile=self.report_output)
-        node = "processed_file"
-        self._nodes[node] = AGDRNode(node, raw_metadata["file"], g3schema.nodes[node], project=self.project_code, program=self.program_name, outputfile=self.report_output)
+        # genomics_assay, aligned_reads_index, raw and processed_file
+        # rows are all in the "file" table, split in a single pass
+        self._nodes.update(self._populate(FILE_TABLE_NODES, [raw_metadata["file"]],
+            lambda: AGDRNode.fromFileTable(raw_metadata["file"], g3schema.nodes, project=self.project_code, program=self.program_name, outputfile=self.report_output)))
         node = "supplementary_file"
-        self._nodes[node] = AGDRNode(node, raw_metadata[node], g3schema.nodes[node], project=self.project_code, program=self.program_name, outputfile=self.report_output)
+        self._nodes[node] = self._node(node, raw_metadata[node])
 
+        if self._population_cache:
+            self._population_cache.log_summary()
 
         # next, validate the spreadsheet itself
         #asv = AGDRSpreadsheetValidator()
         #asv.add(self._nodes)
         #asv.validate(self.spreadsheet_report_output)
 
+    def _node(self, node, table, datasets=None, parents=None, reuse=True):
+        '''
+        the AGDRNode of node type node, populated from table, see
+        _populate()
+        '''
+        populate = lambda: {node: AGDRNode(node, table, self._gen3_dictionary.nodes[node], project=self.project_code, program=self.program_name, parents=parents, outputfile=self.report_output, datasets=datasets)}
+        return self._populate([node], [table], populate, datasets=datasets, context=parents, reuse=reuse)[node]
+
+    def _populate(self, names, tables, populate, datasets=None, context=None, reuse=True):
+        '''
+        populate() returns the AGDRNodes of node types names (name ->
+        node), populated from tables; they are reused from the
+        population cache instead if neither tables nor anything else
+        they were populated from changed since an earlier run
+
+        datasets is the DatasetIndex populate() reads or fills in,
+        context anything else it reads, e.g. the SampleParents
+        '''
+        cache = self._population_cache
+        if not cache or not reuse:
+            return populate()
+
+        gen3nodes = [self._gen3_dictionary.nodes[name] for name in names]
+        key = cache.key(gen3nodes, tables, (self.project_code, self.program_name, datasets, context))
+        cached = cache.load(key, gen3nodes)
+        if cached is None:
+            nodes = populate()
+            populated = [(node.data, node.messagestodisplay, node._unique_id) for node in nodes.values()]
+            cache.store(key, gen3nodes, (populated, datasets))
+            return nodes
+
+        populated, cached_datasets = cached
+        if datasets is not None:
+            # e.g. the datasets added by the dataset node
+            datasets.update(cached_datasets)
+        nodes = {}
+        for name, gen3node, (data, messages, unique_id) in zip(names, gen3nodes, populated):
+            node = AGDRNode(name, None, gen3node, project=self.project_code, program=self.program_name, outputfile=self.report_output)
+            node.data = data
+            node.messagestodisplay = messages
+            node._unique_id = unique_id
+            # reported again, as if populated
+            if messages:
+                node.report_spreadsheet_issues(messages)
+            nodes[name] = node
+        return nodes
+
     def getNodeCount(self):
         count = 0
         for node in self._nodes:
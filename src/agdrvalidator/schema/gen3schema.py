@@ -6,6 +6,7 @@ be updated for specific versions of a metadata structure apart from
 resolving any bugs identified.
 '''
 from agdrvalidator.schema.base import *
+from agdrvalidator.schema.refresolver import RefResolver
 from agdrvalidator.utils import logger
 
 logger = logger.setUp(__name__)
@@ -17,12 +18,17 @@ class Gen3(Schema):
         self._definitions = None
         self._settings = None
         self._terms = None
+        self._resolver = None
+        self._uploadLevels = None # see getUploadLevels()
+        self._uploadOrder = None
 
         self.nodes = {}
 
 
     def setRoot(self, root):
         self._root = root
+        self._uploadLevels = None
+        self._uploadOrder = None
 
     def setDefinitions(self, defs):
         self._definitions = defs
@@ -33,31 +39,75 @@ class Gen3(Schema):
     def setTerms(self, terms):
         self._terms = terms
 
+    def getResolver(self):
+        '''
+        the RefResolver shared by all nodes of this schema
+        '''
+        if self._resolver is None:
+            self._resolver = RefResolver(self._terms, self._definitions, self._settings)
+        return self._resolver
+
+    def resolveProperties(self):
+        '''
+        parse the properties of every node now, rather than when each
+        node is first used, e.g. before the schema is saved
+        '''
+        for node in self.nodes.values():
+            node.getProperties()
+
+    def getUploadLevels(self):
+        '''
+        Node types grouped by depth, from the root node down to the
+        leaves: every node's parents are in earlier levels, so the node
+        types of one level do not depend on each other and can be
+        processed in any order, or concurrently.
+
+        Computed once (topological sort by levels, Kahn's algorithm) and
+        kept as a tuple of tuples; nodes of a level are in the order they
+        are reached from the previous level, following getChildren().
+        '''
+        if self._uploadLevels is None:
+            self._uploadLevels = self._computeUploadLevels()
+        return self._uploadLevels
+
+    def _computeUploadLevels(self):
+        if self._root is None:
+            return ()
+        # only nodes reachable from the root are uploaded
+        reachable = {self._root.name: self._root}
+        pending = [self._root]
+        while pending:
+            node = pending.pop()
+            for child in node.getChildren():
+                if child.name not in reachable:
+                    reachable[child.name] = child
+                    pending.append(child)
+
+        unvisitedParents = {
+            name: len({parent.name for parent in node.getParents()})
+            for name, node in reachable.items()
+        }
+        levels = []
+        level = [self._root]
+        while level:
+            levels.append(tuple(level))
+            nextLevel = []
+            for node in level:
+                for child in {child.name: child for child in node.getChildren()}.values():
+                    unvisitedParents[child.name] -= 1
+                    if unvisitedParents[child.name] == 0:
+                        nextLevel.append(child)
+            level = nextLevel
+        return tuple(levels)
+
     def getUploadOrder(self):
         '''
         Determine upload order required for Gen3 so that metadata nodes 
         can be ingested from the root node down to the leaves.
         '''
-        visitedNodes = set()
-        # walk from root to leaves
-        # only yield node if all parents have been visited
-        def bfsInOrder(node):
-            parents = [x.name for x in node.getParents()]
-            visited = [x.name for x in visitedNodes]
-            if set(parents).issubset(set(visited)):
-                if node.name not in visited:
-                    visitedNodes.add(node)
-                    yield node
-            if node.getChildren():
-                for child in node.getChildren():
-                    if child.name in visitedNodes:
-                        continue
-                    yield from bfsInOrder(child)
-
-        orderedNodes = []
-        for node in bfsInOrder(self._root):
-            orderedNodes.append(node)
-        return orderedNodes
+        if self._uploadOrder is None:
+            self._uploadOrder = tuple(node for level in self.getUploadLevels() for node in level)
+        return self._uploadOrder
 
     def walk(self, revisitNodes=False):
         for node in self.getUploadOrder():
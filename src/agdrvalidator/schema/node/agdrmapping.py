@@ -0,0 +1,899 @@
+'''
+this file contains the mapping between the tables of the AGDR metadata
+spreadsheet and the nodes of the Gen3 dictionary.
+
+Each node type has a NodeMapping, listing
+    fields     -- spreadsheet columns and the Gen3 property each one
+                  is validated against, in spreadsheet order
+    generated  -- properties that are not in the spreadsheet, e.g. the
+                  project_id or the node type, which are the same for
+                  every row
+    row        -- the properties of an output row, in the order they
+                  are displayed in the portal (a preference, not a
+                  requirement)
+    filled / mandatory -- for tables where a partly filled row is an
+                  error: if any of the filled properties has a value,
+                  all of the mandatory ones must have one
+
+Anything that can not be described this way (identifiers built from
+other cells, parents looked up in other tables) is done by a per-node
+method of the AGDR node, named by NodeMapping.complete.
+
+A NodeMapping is resolved against a Gen3 node (see NodeMapping.resolve())
+once per node type, so rows are populated without looking up Gen3
+properties or spreadsheet headers by name.
+'''
+import numpy as np
+
+from agdrvalidator.utils import logger
+
+logger = logger.setUp(__name__)
+
+
+class Field(object):
+    '''
+    A spreadsheet column, mapped to a property of the Gen3 node
+
+        key            -- name of the property in NodeMapping.row etc.
+        column         -- spreadsheet header, key by default
+        rule           -- name of the Gen3 property to validate against,
+                          key by default, False to not validate the column
+        rename         -- output name, if not the name of the rule
+        fallbacks      -- headers used in older templates, if column is
+                          not found
+        report_missing -- whether an empty cell is reported as missing
+    '''
+    __slots__ = ("key", "columns", "rule", "rename", "report_missing")
+
+    def __init__(self, key, column=None, rule=None, rename=None, fallbacks=(), report_missing=False):
+        self.key = key
+        self.columns = (column or key,) + tuple(fallbacks)
+        self.rule = key if rule is None else rule
+        self.rename = rename
+        self.report_missing = report_missing
+
+    def __repr__(self):
+        return f"Field(key={self.key}, columns={self.columns}, rule={self.rule}, rename={self.rename})"
+
+
+class Generated(object):
+    '''
+    A property that is not in the spreadsheet, with the same value for
+    every row; value is a function of the AGDR node
+    '''
+    __slots__ = ("key", "value", "rule", "rename")
+
+    def __init__(self, key, value, rule=None, rename=None):
+        self.key = key
+        self.value = value
+        self.rule = rule or key
+        self.rename = rename
+
+    def __repr__(self):
+        return f"Generated(key={self.key}, rule={self.rule}, rename={self.rename})"
+
+
+class NodeMapping(object):
+    '''
+    How to populate the rows of one node type from its spreadsheet table.
+
+        label       -- node name used in messages about missing fields
+        optional    -- whether the table may be absent from the spreadsheet
+        sheet       -- sheet name used in messages, if the table spans
+                       several sheets
+        unique      -- key of the property identifying a row
+        complete    -- name of the AGDR node method returning a function
+                       that completes each row, see AGDR._populate_node()
+        incomplete  -- message for a partly filled row
+        list_filled -- whether that message lists the filled cells
+        derived     -- keys of fields whose property the complete
+                       function replaces, e.g. a cleaned up value
+    '''
+    def __init__(self, label, fields, row, generated=(), filled=None, mandatory=(),
+                 incomplete=None, list_filled=False, optional=True, sheet=None,
+                 unique=None, complete=None, derived=()):
+        self.label = label
+        self.fields = list(fields)
+        self.generated = list(generated)
+        self.row = list(row)
+        # every field, if not given
+        self.filled = list(filled) if filled is not None else [field.key for field in self.fields]
+        self.mandatory = list(mandatory)
+        self.incomplete = incomplete
+        self.list_filled = list_filled
+        self.optional = optional
+        self.sheet = sheet
+        self.unique = unique
+        self.complete = complete
+        self.derived = frozenset(derived)
+
+    def resolve(self, gen3node):
+        return ResolvedMapping(self, gen3node)
+
+    def __repr__(self):
+        return f"NodeMapping(label={self.label}, fields={len(self.fields)}, row={self.row})"
+
+
+class ResolvedMapping(object):
+    '''
+    A NodeMapping with the Gen3 property of each field looked up, and
+    the position of each column in the rows of a table found once per
+    table (rows of a table share their header index)
+    '''
+    def __init__(self, mapping, gen3node):
+        self.mapping = mapping
+        self.rules = [gen3node.getProperty(field.rule) if field.rule else None for field in mapping.fields]
+        self.generated_rules = [gen3node.getProperty(generated.rule) for generated in mapping.generated]
+        self._positions = {} # id(header index) -> (header index, position of each field)
+
+    def _columns(self, row):
+        index = row.index()
+        entry = self._positions.get(id(index))
+        if entry is None or entry[0] is not index:
+            positions = []
+            for field in self.mapping.fields:
+                position = None
+                for column in field.columns:
+                    position = index.get(column.lower())
+                    if position is not None:
+                        break
+                positions.append(position)
+            entry = (index, positions)
+            self._positions[id(index)] = entry
+        return entry[1]
+
+    def presence(self, data):
+        '''
+        RowPresence of the rows of data, from the presence masks of the
+        table (see SpreadsheetNode.presence()); None if it has none
+        '''
+        masks = data.presence() if data.data else None
+        if masks is None:
+            return None
+        notna, filled = masks
+        # fields read unchanged from a column -> position, None if the column is missing
+        columns = {
+            field.key: position
+            for field, position in zip(self.mapping.fields, self._columns(data.data[0]))
+            if field.key not in self.mapping.derived
+        }
+        return RowPresence(self.mapping, columns, notna, filled)
+
+    def read(self, row):
+        '''
+        yields (field, Gen3 property, spreadsheet property) for each
+        field, the spreadsheet property being None if its column is
+        missing
+        '''
+        data = row.data
+        for field, rule, position in zip(self.mapping.fields, self.rules, self._columns(row)):
+            yield field, rule, (data[position] if position is not None else None)
+
+
+class RowPresence(object):
+    '''
+    For each row of a table, whether the cells of a NodeMapping's
+    groups of fields have values, worked out for the whole table at
+    once from its presence masks:
+
+        reported  -- all report_missing fields have a value
+        filled    -- any of the filled group has a value
+        complete  -- all of the mandatory group have a value
+
+    Only fields read unchanged from a column are covered; the keys of
+    the other properties of a group (generated, or set by the complete
+    function) are in filled_others and mandatory_others, to be checked
+    row by row.
+    '''
+    def __init__(self, mapping, columns, notna, filled):
+        reported = [field.key for field in mapping.fields if field.report_missing]
+        self.reported, _ = RowPresence._group(reported, columns, notna, every=True)
+        self.filled, self.filled_others = RowPresence._group(mapping.filled, columns, filled, every=False)
+        self.complete, self.mandatory_others = RowPresence._group(mapping.mandatory, columns, filled, every=True)
+
+    @staticmethod
+    def _group(keys, columns, mask, every):
+        '''
+        per row, whether every (or any) key of the group that is read
+        from a column has a value; and the keys that are not
+        '''
+        positions = [columns[key] for key in keys if key in columns]
+        others = [key for key in keys if key not in columns]
+        present = [position for position in positions if position is not None]
+        if not every:
+            # a missing column never has a value
+            return mask[:, present].any(axis=1), others
+        if len(present) < len(positions):
+            return np.zeros(mask.shape[0], dtype=bool), others
+        return mask[:, present].all(axis=1), others
+
+    def __repr__(self):
+        return f"RowPresence(rows={len(self.filled)}, filled_others={self.filled_others}, mandatory_others={self.mandatory_others})"
+
+
+# generated properties shared by several node types
+TYPE = Generated("type", lambda node: node.gen3name)
+PROJECT_ID = Generated("project_id", lambda node: f"{node.program_name}-{node.project_name}")
+PROJECTS_CODE = Generated("projects.code", lambda node: f"{node.project_name}", rule="project_id", rename="projects.code")
+
+
+PROJECT = NodeMapping(
+    "project",
+    optional=False,
+    generated=[
+        Generated("dbgap_accession_number", lambda node: node.project_name),
+        Generated("code", lambda node: node.project_name),
+    ],
+    fields=[
+        Field("detailed_description", "project_description", report_missing=True),
+        Field("name", report_missing=True),
+    ],
+    row=["dbgap_accession_number", "code", "detailed_description", "name"],
+)
+
+
+DATASET = NodeMapping(
+    "dataset",
+    generated=[PROJECT_ID, PROJECTS_CODE, TYPE],
+    fields=[
+        Field("name", "dataset_name", report_missing=True),
+        Field("collection_date", "date_collected", rename="collection_date", report_missing=True),
+        # spelling mistake in the template we had at one point - need to remove in the future
+        Field("detailed_description", "dataset_description", fallbacks=["datatset_description"], report_missing=True),
+        Field("investigator_affiliation", report_missing=True),
+        Field("investigator_name", report_missing=True),
+        Field("contact", report_missing=True),
+        Field("support_source"),
+        Field("data_availability"),
+        Field("agdr_doi"),
+        Field("application_form", "access_request_form_link"),
+        Field("submitter_id", "dataset_id"),
+    ],
+    unique="submitter_id",
+    complete="_complete_dataset",
+    row=[
+        "submitter_id",
+        "project_id",
+        "projects.code",
+        "collection_date",
+        "agdr_doi",
+        "application_form",
+        "contact",
+        "data_availability",
+        "detailed_description",
+        "investigator_affiliation",
+        "investigator_name",
+        "name",
+        "support_source",
+        "type",
+    ],
+)
+
+
+EXTERNAL_DATASET = NodeMapping(
+    "external_dataset",
+    generated=[PROJECT_ID, PROJECTS_CODE, TYPE],
+    fields=[
+        Field("submitter_id", "dataset_name"),
+        # not yet in the dictionary - future work
+        Field("date_collected", rule=False),
+        Field("detailed_description", "dataset_description", fallbacks=["datatset_description"]),
+        Field("investigator_affiliation"),
+        Field("investigator_name"),
+        Field("contact"),
+        Field("support_source"),
+        Field("submitted_to_insdc"),
+        Field("bioproject_accession"),
+        Field("biosample_accession"),
+        Field("dataset_accession"),
+        Field("external_doi"),
+        # duplicate of submitter_id
+        Field("name", "dataset_name"),
+    ],
+    unique="submitter_id",
+    mandatory=["detailed_description", "investigator_affiliation", "investigator_name", "name"],
+    incomplete="External dataset has some cells filled but not enough for an external dataset to be populated, either delete or complete",
+    row=[
+        "submitter_id",
+        "project_id",
+        "projects.code",
+        "bioproject_accession",
+        "biosample_accession",
+        "date_collected",
+        "contact",
+        "dataset_accession",
+        "detailed_description",
+        "external_doi",
+        "investigator_affiliation",
+        "investigator_name",
+        "name",
+        "submitted_to_insdc",
+        "support_source",
+        "type",
+    ],
+)
+
+
+CONTRIBUTOR = NodeMapping(
+    "contributor",
+    generated=[TYPE, PROJECT_ID],
+    fields=[
+        Field("name"),
+        Field("institution"),
+        # not extracted from the dictionary by the parser
+        Field("dataset_name", rule="dataset"),
+    ],
+    unique="submitter_id",
+    complete="_complete_contributor",
+    filled=["dataset", "institution", "name"],
+    mandatory=["dataset", "institution", "name"],
+    incomplete="Contributors table has some cells filled but not enough for a contributor to be populated, either delete or complete",
+    row=["submitter_id", "dataset", "institution", "name", "type", "project_id"],
+)
+
+
+EXPERIMENT = NodeMapping(
+    "experiment",
+    # experiments can be in multiple sheets
+    sheet="Experiment",
+    generated=[TYPE, PROJECT_ID],
+    fields=[
+        Field("submitter_id", "experiment_name", report_missing=True),
+        Field("dataset_name", rule="dataset", report_missing=True),
+        Field("data_description"),
+    ],
+    unique="submitter_id",
+    complete="_complete_experiment",
+    row=["submitter_id", "dataset", "data_description", "type", "project_id"],
+)
+
+
+GENOME = NodeMapping(
+    "genome",
+    generated=[TYPE],
+    fields=[
+        Field("submitter_id", "specimen_id"),
+        Field("experiment", "experiment_name", rename="experiment.submitter_id"),
+        Field("specimen_voucher"),
+        Field("secondary_identifier"),
+        Field("collection_date"),
+        Field("specimen_scientific_name"),
+        Field("specimen_maori_name"),
+        Field("specimen_common_name"),
+        Field("basis_of_record"),
+        Field("geo_loc_name"),
+        Field("environmental_medium"),
+        Field("habitat"),
+        Field("latitude_decimal_degrees"),
+        Field("longitude_decimal_degrees"),
+        Field("coordinate_uncertainty_in_meters"),
+        Field("age", "** age"),
+        Field("age_unit"),
+        Field("developmental_stage", "** dev_stage"),
+        # gen3 properties with $ref may not be extracted by the parser
+        Field("birth_date", rename="birth_date"),
+        Field("birth_location"),
+        Field("sex"),
+        Field("collected_by"),
+        Field("biomaterial_provider"),
+        Field("breeding_history"),
+        Field("breeding_method"),
+        Field("breed"),
+        Field("cell_line"),
+        Field("culture_collection"),
+        Field("death_date", rename="death_date"),
+        Field("disease"),
+        Field("genotype"),
+        Field("phenotype"),
+        Field("growth_protocol"),
+        Field("health_state"),
+        Field("store_cond"),
+        Field("cultivar"),
+        Field("ecotype"),
+        Field("maximum_elevation_in_meters"),
+        Field("minimum_elevation_in_meters"),
+        Field("maximum_depth_in_meters"),
+        Field("minimum_depth_in_meters"),
+        Field("specimen_collect_device"),
+        Field("strain"),
+    ],
+    unique="submitter_id",
+    mandatory=["submitter_id", "experiment"],
+    incomplete="Genome has some cells filled but not enough for a genome to be populated, either delete or complete",
+    row=[
+        "submitter_id",
+        "geo_loc_name",
+        "experiment",
+        "age",
+        "age_unit",
+        "basis_of_record",
+        "biomaterial_provider",
+        "birth_date",
+        "birth_location",
+        "breed",
+        "breeding_history",
+        "breeding_method",
+        "cell_line",
+        "collected_by",
+        "collection_date",
+        "coordinate_uncertainty_in_meters",
+        "cultivar",
+        "culture_collection",
+        "death_date",
+        "developmental_stage",
+        "disease",
+        "ecotype",
+        "environmental_medium",
+        "genotype",
+        "growth_protocol",
+        "habitat",
+        "health_state",
+        "latitude_decimal_degrees",
+        "longitude_decimal_degrees",
+        "maximum_depth_in_meters",
+        "maximum_elevation_in_meters",
+        "minimum_depth_in_meters",
+        "minimum_elevation_in_meters",
+        "phenotype",
+        "secondary_identifier",
+        "sex",
+        # source_material_id is not in the template, combined with the secondary_identifier field
+        "specimen_collect_device",
+        "specimen_common_name",
+        "specimen_maori_name",
+        "specimen_scientific_name",
+        "specimen_voucher",
+        "store_cond",
+        "strain",
+        "type",
+    ],
+)
+
+
+METAGENOME = NodeMapping(
+    "metagenome",
+    generated=[TYPE],
+    fields=[
+        # sample_id is the old name in the spreadsheet
+        Field("submitter_id", "metagenomic_id", fallbacks=["sample_id"]),
+        Field("experiment", "experiment_name", rename="experiment.submitter_id"),
+        Field("secondary_identifier"),
+        Field("basis_of_record"),
+        Field("collection_date"),
+        Field("host"),
+        Field("environmental_medium"),
+        Field("habitat"),
+        Field("geo_loc_name"),
+        Field("latitude_decimal_degrees"),
+        Field("longitude_decimal_degrees"),
+        Field("coordinate_uncertainty_in_meters"),
+        Field("specimen_collect_device"),
+        Field("collected_by"),
+        Field("store_cond"),
+        Field("biomaterial_provider"),
+        Field("breeding_history"),
+        Field("breeding_method"),
+        Field("cell_line"),
+        Field("culture_collection"),
+        Field("maximum_elevation_in_meters"),
+        Field("minimum_elevation_in_meters"),
+        Field("maximum_depth_in_meters"),
+        Field("minimum_depth_in_meters"),
+    ],
+    unique="submitter_id",
+    mandatory=[
+        "submitter_id",
+        "habitat",
+        "geo_loc_name",
+        "experiment",
+        "environmental_medium",
+        "basis_of_record",
+        "collection_date",
+    ],
+    incomplete="Metagenome has some cells filled but not enough for a metagenome to be populated, either delete or complete",
+    row=[
+        "submitter_id",
+        "habitat",
+        "geo_loc_name",
+        "experiment",
+        "environmental_medium",
+        "basis_of_record",
+        "biomaterial_provider",
+        "breeding_history",
+        "breeding_method",
+        "cell_line",
+        "collected_by",
+        "collection_date",
+        "coordinate_uncertainty_in_meters",
+        "culture_collection",
+        "host",
+        "latitude_decimal_degrees",
+        "longitude_decimal_degrees",
+        "maximum_depth_in_meters",
+        "maximum_elevation_in_meters",
+        "minimum_depth_in_meters",
+        "minimum_elevation_in_meters",
+        "secondary_identifier",
+        # source_material_id is not in the template, combined with the secondary_identifier field
+        "specimen_collect_device",
+        "store_cond",
+        "type",
+    ],
+)
+
+
+SAMPLE = NodeMapping(
+    "sample",
+    optional=False,
+    generated=[PROJECT_ID, TYPE],
+    fields=[
+        Field("submitter_id", "sample_id"),
+        Field("secondary_identifier"),
+        Field("specimen_voucher"),
+        Field("sample_title"),
+        Field("environmental_medium"),
+        Field("collection_date"),
+        Field("collected_by"),
+        Field("geo_loc_name"),
+        Field("habitat"),
+        Field("latitude_decimal_degrees"),
+        Field("longitude_decimal_degrees"),
+        Field("coordinate_uncertainty_in_meters"),
+        Field("developmental_stage"),
+        Field("tissue"),
+        Field("sample_collect_device"),
+        Field("sample_mat_process"),
+        Field("sample_size_value"),
+        Field("sample_size_unit"),
+        Field("store_cond"),
+    ],
+    complete="_complete_sample",
+    filled=[
+        "submitter_id",
+        "collected_by",
+        "collection_date",
+        "coordinate_uncertainty_in_meters",
+        "developmental_stage",
+        "environmental_medium",
+        "geo_loc_name",
+        "habitat",
+        "latitude_decimal_degrees",
+        "longitude_decimal_degrees",
+        "sample_collect_device",
+        "sample_mat_process",
+        "sample_size_unit",
+        "sample_size_value",
+        "sample_title",
+        "secondary_identifier",
+        "specimen_voucher",
+        "store_cond",
+        "tissue",
+        "parent",
+    ],
+    mandatory=["submitter_id", "collection_date", "parent"],
+    incomplete="Sample has some cells filled but not enough for a sample to be populated, either delete or complete",
+    list_filled=True,
+    row=[
+        "submitter_id",
+        "project_id",
+        # biomaterial_provider is not in the template, it is in the experiments_genomic tab
+        "collected_by",
+        "collection_date",
+        "coordinate_uncertainty_in_meters",
+        "developmental_stage",
+        "environmental_medium",
+        "geo_loc_name",
+        "habitat",
+        # host is only in the experiments_metagenomic tab
+        "latitude_decimal_degrees",
+        "longitude_decimal_degrees",
+        "sample_collect_device",
+        "sample_mat_process",
+        "sample_size_unit",
+        "sample_size_value",
+        "sample_title",
+        "secondary_identifier",
+        "specimen_voucher",
+        "store_cond",
+        "tissue",
+        "parent", # either genome or metagenome submitter_id
+        "type",
+    ],
+)
+
+
+PUBLICATION = NodeMapping(
+    "publication",
+    generated=[TYPE],
+    fields=[
+        Field("doi", "publication"),
+    ],
+    unique="submitter_id",
+    complete="_complete_publication",
+    row=["doi", "dataset", "external_dataset", "submitter_id", "type"],
+)
+
+
+GENOMICS_ASSAY = NodeMapping(
+    "genomics_assay",
+    generated=[TYPE],
+    fields=[
+        Field("sample", "sample_id", rule="sample.submitter_id", rename="sample.submitter_id"),
+        Field("platform"),
+        Field("instrument_model"),
+        Field("adapter_name"),
+        Field("adapter_sequence"),
+        Field("barcoding_applied"),
+        Field("base_caller_name"),
+        Field("base_caller_version"),
+        Field("flow_cell_barcode"),
+        Field("includes_spike_ins"),
+        Field("is_paired_end"),
+        Field("library_name"),
+        Field("library_preparation_kit_catalog_number"),
+        Field("library_preparation_kit_name"),
+        Field("library_preparation_kit_vendor"),
+        Field("library_preparation_kit_version"),
+        Field("library_selection"),
+        Field("library_strand"),
+        Field("library_strategy"),
+        Field("read_group_name"),
+        Field("read_length"),
+        Field("sequencing_center"),
+        Field("sequencing_date", rename="sequencing_date"),
+        Field("size_selection_range"),
+        Field("spike_ins_concentration"),
+        Field("spike_ins_fasta"),
+        Field("target_capture_kit"),
+        Field("target_capture_kit_catalog_number"),
+        Field("target_capture_kit_name"),
+        Field("target_capture_kit_target_region"),
+        Field("target_capture_kit_vendor"),
+        Field("target_capture_kit_version"),
+        Field("to_trim_adapter_sequence"),
+        Field("fragment_maximum_length"),
+        Field("fragment_mean_length"),
+        Field("fragment_minimum_length"),
+        Field("fragment_standard_deviation_length"),
+        Field("multiplex_barcode"),
+    ],
+    unique="submitter_id",
+    complete="_complete_genomics_assay",
+    filled=[
+        "submitter_id",
+        "sample",
+        "adapter_name",
+        "adapter_sequence",
+        "barcoding_applied",
+        "base_caller_name",
+        "base_caller_version",
+        "flow_cell_barcode",
+        "fragment_maximum_length",
+        "fragment_mean_length",
+        "fragment_minimum_length",
+        "fragment_standard_deviation_length",
+        "includes_spike_ins",
+        "instrument_model",
+        "is_paired_end",
+        "library_name",
+        "library_preparation_kit_catalog_number",
+        "library_preparation_kit_name",
+        "library_preparation_kit_vendor",
+        "library_preparation_kit_version",
+        "library_selection",
+        "library_strand",
+        "library_strategy",
+        "multiplex_barcode",
+        "platform",
+        "read_group_name",
+        "read_length",
+        "sequencing_center",
+        "sequencing_date",
+        "size_selection_range",
+        "spike_ins_concentration",
+        "spike_ins_fasta",
+        "target_capture_kit_catalog_number",
+        "target_capture_kit_name",
+        "target_capture_kit_target_region",
+        "target_capture_kit_vendor",
+        "target_capture_kit_version",
+        "to_trim_adapter_sequence",
+    ],
+    mandatory=["sample", "platform"],
+    incomplete="Files has some cells filled but not enough for a genomic assay to be populated, either delete or complete",
+    list_filled=True,
+    row=[
+        "submitter_id",
+        "sample",
+        "adapter_name",
+        "adapter_sequence",
+        "barcoding_applied",
+        "base_caller_name",
+        "base_caller_version",
+        "flow_cell_barcode",
+        "fragment_maximum_length",
+        "fragment_mean_length",
+        "fragment_minimum_length",
+        "fragment_standard_deviation_length",
+        "includes_spike_ins",
+        "instrument_model",
+        "is_paired_end",
+        "library_name",
+        "library_preparation_kit_catalog_number",
+        "library_preparation_kit_name",
+        "library_preparation_kit_vendor",
+        "library_preparation_kit_version",
+        "library_selection",
+        "library_strand",
+        "library_strategy",
+        "multiplex_barcode",
+        "platform",
+        "read_group_name",
+        "read_length",
+        "sequencing_center",
+        "sequencing_date",
+        "size_selection_range",
+        "spike_ins_concentration",
+        "spike_ins_fasta",
+        "target_capture_kit", # this is not in the spreadsheet
+        "target_capture_kit_catalog_number",
+        "target_capture_kit_name",
+        "target_capture_kit_target_region",
+        "target_capture_kit_vendor",
+        "target_capture_kit_version",
+        "to_trim_adapter_sequence",
+        "type",
+    ],
+)
+
+
+def _file_mapping(data_category, extra_row=()):
+    '''
+    raw, processed and aligned reads index files share the files table,
+    only rows of their data_category are theirs
+    '''
+    return NodeMapping(
+        data_category,
+        generated=[TYPE],
+        fields=[
+            Field("data_category"),
+            Field("md5sum"),
+            Field("file_size"),
+            Field("file_name"),
+            Field("experimental_strategy"),
+            Field("data_type"),
+            Field("data_format"),
+            # for files, submitter_id is the file_name
+            Field("submitter_id", "file_name", rename="submitter_id"),
+            # raw files only
+            Field("read_pair_number"),
+            # assuming that they will have the same name
+            Field("processed_file", "file_name"),
+        ],
+        unique="submitter_id",
+        complete="_complete_file",
+        derived=["data_category"],
+        filled=[
+            "md5sum",
+            "file_size",
+            "file_name",
+            "experimental_strategy",
+            "data_type",
+            "data_format",
+            "data_category",
+            "genomics_assay",
+            "read_pair_number",
+        ],
+        mandatory=[
+            "md5sum",
+            "file_size",
+            "file_name",
+            "experimental_strategy",
+            "data_type",
+            "data_format",
+            "data_category",
+            "genomics_assay",
+        ],
+        incomplete="Files has some cells filled but not enough for a file to be populated, either delete or complete",
+        list_filled=True,
+        row=[
+            "md5sum",
+            "file_size",
+            "file_name",
+            "experimental_strategy",
+            "data_type",
+            "data_format",
+            "data_category",
+            "genomics_assay",
+            "submitter_id",
+            "type",
+        ] + list(extra_row),
+    )
+
+RAW = _file_mapping("Raw Read File", extra_row=["read_pair_number"])
+PROCESSED_FILE = _file_mapping("Processed File")
+ALIGNED_READS_INDEX = _file_mapping("Aligned Reads Index", extra_row=["processed_file"])
+
+# the files table holds the rows of several node types: genomics_assay
+# has a row for every file, each file node the rows of its data_category
+FILE_TABLE_NODES = ("genomics_assay", "aligned_reads_index", "raw", "processed_file")
+DATA_CATEGORY_NODES = {
+    "raw read file": "raw",
+    "processed file": "processed_file",
+    "aligned reads index": "aligned_reads_index",
+}
+# valid, but not populated from the files table
+DATA_CATEGORIES = tuple(DATA_CATEGORY_NODES) + ("aligned reads file",)
+# rows of an invalid data_category are reported by the raw node
+INVALID_DATA_CATEGORY_NODE = "raw"
+
+
+def routeFileRow(row):
+    '''
+    name of the file node a row of the files table belongs to, by its
+    data_category, or None if it belongs to none
+    '''
+    property = row.get("data_category")
+    data_category = str(property.data if property is not None else None).lower()
+    if data_category in DATA_CATEGORY_NODES:
+        return DATA_CATEGORY_NODES[data_category]
+    if data_category in DATA_CATEGORIES:
+        return None
+    return INVALID_DATA_CATEGORY_NODE
+
+
+SUPPLEMENTARY_FILE = NodeMapping(
+    "supplementary_file",
+    generated=[
+        TYPE,
+        Generated("data_category", lambda node: "Supplementary File"),
+    ],
+    fields=[
+        Field("md5sum"),
+        Field("file_size"),
+        Field("file_name"),
+        Field("data_type"),
+        Field("data_format"),
+        Field("experiment", "experiment_name", rename="experiment.submitter_id"),
+        # for files, submitter_id is the file_name
+        Field("submitter_id", "file_name", rename="submitter_id"),
+    ],
+    unique="submitter_id",
+    complete="_complete_supplementary_file",
+    derived=["md5sum"],
+    filled=["md5sum", "file_size", "file_name", "data_type", "data_format", "data_category", "experiment"],
+    mandatory=["md5sum", "file_size", "file_name", "data_type", "data_format", "data_category", "experiment"],
+    incomplete="Supplementary files has some cells filled but not enough for a supplementary file to be populated, either delete or complete",
+    list_filled=True,
+    row=[
+        "md5sum",
+        "file_size",
+        "file_name",
+        "data_type",
+        "data_format",
+        "data_category",
+        "experiment",
+        "submitter_id",
+        "type",
+    ],
+)
+
+
+# AGDR node name -> NodeMapping
+# (indigenous_governance and iwi are not populated from the spreadsheet yet)
+NODE_MAPPINGS = {
+    "project": PROJECT,
+    "dataset": DATASET,
+    "external_dataset": EXTERNAL_DATASET,
+    "contributor": CONTRIBUTOR,
+    "experiment": EXPERIMENT,
+    "genome": GENOME,
+    "metagenome": METAGENOME,
+    "sample": SAMPLE,
+    "publication": PUBLICATION,
+    "genomics_assay": GENOMICS_ASSAY,
+    "supplementary_file": SUPPLEMENTARY_FILE,
+    "raw": RAW,
+    "processed_file": PROCESSED_FILE,
+    "aligned_reads_index": ALIGNED_READS_INDEX,
+}
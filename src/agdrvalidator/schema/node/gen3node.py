@@ -9,6 +9,7 @@ from enum import Enum
 import agdrvalidator.schema.node.property.gen3property as Property
 from agdrvalidator import AgdrFormatException
 from agdrvalidator.schema.node.base import Node as Node
+from agdrvalidator.schema.refresolver import RefResolver
 from agdrvalidator.utils import logger
 
 logger = logger.setUp(__name__)
@@ -63,23 +64,45 @@ class Gen3(Node):
         logger.debug(f"created node: {name}")
         self._parse_structure(structure)
 
-        self._last_lookup_table = None
+        self._resolver = None # RefResolver, set by parse_properties()
         self._properties = []
+        self._propertySet = set()   # the properties added, for membership checks
+        self._propertyIndex = {}    # name and input name -> property
+        self._propertiesSorted = True
+        self._deferredProperties = None # arguments to parse_properties(), see deferProperties()
         
     def __str__(self):
-        properties_str = ',\n\t '.join(str(prop) for prop in self._properties)
+        properties_str = ',\n\t '.join(str(prop) for prop in self.getProperties())
         return f"Gen3 Node: {self.name}, Properties: [{properties_str}]"
 
     def __repr__(self):
-        properties_repr = ',\n\t '.join(str(prop) for prop in self._properties)
+        properties_repr = ',\n\t '.join(str(prop) for prop in self.getProperties())
         return f"Gen3(name={self.name!r}, properties=[{properties_repr}])"
     
     def getProperty(self, name):
-        for prop in self._properties:       
-            #print(f"___+_+_+_______________property: {prop._name}")
-            if name == prop._name or name == prop._input_name:
-                return prop
-        return None
+        self._resolveDeferredProperties()
+        if not self._propertiesSorted:
+            self._sortProperties()
+        return self._propertyIndex.get(name)
+
+    def getProperties(self):
+        self._resolveDeferredProperties()
+        if not self._propertiesSorted:
+            self._sortProperties()
+        return self._properties
+
+    def _sortProperties(self):
+        '''
+        sort the properties by name, and index them by name and input
+        name; where several properties share a name, the first one in
+        sorted order is the one found
+        '''
+        self._properties = sorted(self._properties, key=lambda p: p.get_name())
+        self._propertyIndex = {}
+        for prop in self._properties:
+            self._propertyIndex.setdefault(prop._name, prop)
+            self._propertyIndex.setdefault(prop._input_name, prop)
+        self._propertiesSorted = True
 
     def getParents(self):
         return self._parents
@@ -111,8 +134,11 @@ class Gen3(Node):
     
     def addParent(self, parent):
         # input: Node object (parent)
-        self._parents.append(parent)
-        self._parents = list(set(self._parents))
+        # kept in the order the links are made, so that walking the
+        # schema (and numbering the TSV files) does not depend on where
+        # the nodes happen to be in memory
+        if parent not in self._parents:
+            self._parents.append(parent)
     
 
     def addChild(self, child):
@@ -120,8 +146,8 @@ class Gen3(Node):
         #
         # self's parents are already set 
         # addChild is called as the dictionary is parsed
-        self._children.append(child)
-        self._children = list(set(self._children))
+        if child not in self._children:
+            self._children.append(child)
 
 
     def _parse_simple(self, structure):
@@ -164,71 +190,6 @@ class Gen3(Node):
                 for node in self._parse_complex(link):
                     self._parentLinks.append(node)
 
-    def _extract_definition_from_ref(self, lookup, ref):
-        # for now: assume no recursion needed
-        ref = ref.split("#")
-        category = ref[0]
-        key = ref[1].split("/")[-1]
-        if category in lookup:
-            return {key: lookup[category][key]}
-        else:
-            raise AgdrFormatException(f"could not find definition for {ref}")
-
-    def _extract_properties_from_ref(self, ref, terms, definitions, settings, isTopLevel=True):
-        '''
-        extract all the referenced properties
-
-        if any of the refs point to other definitions, 
-        substitute them in
-        '''
-        lookup = {
-            "_terms.yaml": terms,
-            "_definitions.yaml": definitions,
-            "_settings.yaml": settings
-        }
-        raw_properties = {}
-        ref = ref.split("#")
-        category = ref[0]
-        key = ref[1].split("/")[-1]
-        if category:
-            self._last_lookup_table = category 
-        else:
-            logger.debug(f"_____________________________recursive definition: {key}_____________________________")
-            category = self._last_lookup_table
-            
-        if category in lookup:
-            for property in lookup[category][key]:
-                logger.debug(property)
-                logger.debug(key)
-                if "$ref" in lookup[category][key][property]:
-                    # paste in property 
-                    # add it to the list of properties
-                    subkey = lookup[category][key][property]["$ref"]
-                    if subkey[0] == '#':
-                        subkey = category + subkey
-                    raw_property = self._extract_definition_from_ref(lookup, subkey)
-                    logger.debug("____raw property____", raw_property)
-                    if "term" in raw_property and "$ref" in raw_property["term"]:
-                        term = self._extract_definition_from_ref(key, raw_property["term"]["$ref"])
-                        logger.debug("____Extracted term:", term)
-                        del raw_property["term"]
-                        for item in term:
-                            #####
-                            raw_property[item] = term[item]
-                    if isTopLevel:
-                        raw_properties[property] = raw_property
-                    else:
-                        raw_properties[key] = {property: raw_property}
-                else:
-                    if isTopLevel:
-                        raw_properties[property] = lookup[category][key][property]
-                    else:
-                        raw_properties[key] = {property: lookup[category][key][property]}
-        else:
-            raise AgdrFormatException(f"property {property} has an invalid $ref: {ref}")
-
-        return raw_properties
-
     def _extract_property(self, properties, property, terms, definitions, settings):
         # extraction for properties with no nesting at top level
         # there may be some nesting in properties
@@ -242,7 +203,7 @@ class Gen3(Node):
                 logger.warning(f"term found in property: {key}.\tSKIPPING" )
             elif item == "$ref":
                 logger.debug("~~~~ref")
-                extracted = self._extract_properties_from_ref(value[item], terms, definitions, settings, isTopLevel=False)
+                extracted = self._resolver.resolve(value[item], isTopLevel=False)
                 for prop in extracted:
                     raw_result[prop] = extracted[prop]
             elif item == "enum":
@@ -252,17 +213,42 @@ class Gen3(Node):
         return raw_result
 
     def add_property(self, property):
-        if property not in self._properties:
+        # the properties are sorted and indexed once, when next looked up
+        if property not in self._propertySet:
+            self._propertySet.add(property)
             self._properties.append(property)
-        self._properties = sorted(self._properties, key=lambda p: p.get_name())
+            self._propertiesSorted = False
+
+    def deferProperties(self, properties, required, terms, definitions, settings, resolver=None):
+        '''
+        keep the properties of the node as found in the dictionary; they
+        are parsed (see parse_properties()) when first looked up, so that
+        node types a run does not use are never parsed
+        '''
+        self._deferredProperties = (properties, required, terms, definitions, settings, resolver)
+
+    def _resolveDeferredProperties(self):
+        if self._deferredProperties is not None:
+            deferred = self._deferredProperties
+            self._deferredProperties = None
+            logger.debug(f"parsing properties of node: {self.name}")
+            self.parse_properties(*deferred)
 
-    def parse_properties(self, properties, required, terms, definitions, settings):
+    def parse_properties(self, properties, required, terms, definitions, settings, resolver=None):
+        '''
+        resolver is the RefResolver shared by all nodes of the dictionary;
+        one is created for this node only if it is not given
+        '''
+        self._resolver = resolver or RefResolver(terms, definitions, settings)
         nested_properties = []
+        nested_category = None # dictionary section the nested properties came from
         unnested_properties = []
         for property in properties:
             logger.debug(property)
             if property == "$ref":
-                nested_properties = self._extract_properties_from_ref(properties[property], terms, definitions, settings, isTopLevel=True)
+                nested_category = self._resolver.category(properties[property])
+                # copied, resolved $refs are shared and immutable
+                nested_properties = dict(self._resolver.resolve(properties[property], isTopLevel=True))
             else:
                 p = self._extract_property(properties, property, terms, definitions, settings)
                 unnested_properties.append({property: p})
@@ -272,7 +258,7 @@ class Gen3(Node):
         #type was missing from few tsv because sample and other have a ref in a ref e.g. organism_properties which is referring ubiquitous_properties which need to be processed too
         for property in nested_properties:
             if property == "$ref":
-                new_nested_properties = self._extract_properties_from_ref(nested_properties[property], terms, definitions, settings, isTopLevel=True)
+                new_nested_properties = self._resolver.resolve(nested_properties[property], isTopLevel=True, base=nested_category)
                 for new_property in new_nested_properties:
                     additional_properties.append(new_property)
         
@@ -341,6 +327,7 @@ class Gen3(Node):
                 p = Property.Gen3(key, value=property[key], required=required, type=property[key]["type"], pattern=pat)
                 # create property object
                 self.add_property(p)
+        self._sortProperties()
 
     def extractPattern(self, nested_props):
         '''
@@ -7,12 +7,41 @@ of the AGDR dictionary.
 
 import numbers
 import re
+import weakref
 
 from agdrvalidator import *  # import AGDR exception types
 from agdrvalidator.schema.node.property.gen3property import *
-from agdrvalidator.utils import is_nan
+from agdrvalidator.utils import is_nan, logger
 from agdrvalidator.utils.rich_tabular import CellLocation, SpreadsheetProperty
 
+logger = logger.setUp(__name__)
+
+# the dictionary applies a UUID pattern to these, but they can be any string
+FREE_STRINGS = frozenset([
+    "submitter_id",
+    "file_name",
+    "habitat",
+    "geo_loc_name",
+    "environmental_medium",
+    "collected_by",
+    "secondary_identifier",
+    "store_cond"
+])
+# these have a pattern in the dictionary, but are validated by type
+ACTUALLY_INTEGERS = frozenset([
+    "file_size",
+    "latitude_decimal_degrees",
+    "longitude_decimal_degrees"
+])
+ACTUALLY_FLOATS = frozenset([
+    "coordinate_uncertainty_in_meters",
+])
+# integers in the dictionary, validated as numbers
+INTEGERS_ACTUALLY_FLOATS = frozenset([
+    "latitude_decimal_degrees",
+    "longitude_decimal_degrees"
+])
+
 
 class AGDR(SpreadsheetProperty):
     '''
@@ -22,6 +51,7 @@ class AGDR(SpreadsheetProperty):
     If the SpreadsheetProperty has no data, then it represents a 
     header cell
     '''
+    __slots__ = ("gen3_name", "rule")
 
     @classmethod
     def convertName(_, name):
@@ -63,159 +93,245 @@ class AGDR(SpreadsheetProperty):
             # No rule specified for validation; assume valid.
             return True, None
 
-        # Initialize validation result
-        valid = True
-        reason = None
-
         is_empty = self.data is None or self.data == "" or is_nan(self.data)
         if is_empty:
             # purge the nans
             self.data = None
 
         if not self.required and is_empty:
-            return valid, reason
+            return True, None
         elif self.required and is_empty:
             return False, f"Required field '{self.name}' is missing"
 
-        # 1. Pattern Validation (if applicable)
-        if self.rule._pattern:
-            pattern_valid, reason = self._is_pattern_valid()
-            if not pattern_valid:
-                return False, reason
+        # pattern, type and enum checks of the rule, compiled once for
+        # each name the rule is used under
+        check = self.rule.validator(self.gen3_name, compile_validator)
+        return check(self)
+
+
+def compile_validator(rule, gen3_name):
+    """
+    Returns a function validating the (non-empty) data of an AGDR
+    property against a Gen3 rule, as check(property) -> (valid, reason).
 
+    Which checks apply only depends on the rule and on the name the
+    property is output as, so they are worked out here once, instead of
+    for every cell. Like the checks themselves, the function may convert
+    property.data, e.g. to an int or to the allowed spelling of an enum.
+    """
+    pattern_check = _compile_pattern_check(rule, gen3_name)
+    type_check = _compile_type_check(rule, gen3_name)
+    if not pattern_check:
+        return ValueMemo(type_check, gen3_name)
+
+    def check(property):
+        # 1. Pattern Validation (if applicable)
+        valid, reason = pattern_check(property)
+        if not valid:
+            return False, reason
         # 2. Type Validation
-        type_info = self.rule._type
-        if isinstance(type_info, dict):
-            if 'enum' in type_info:
-                valid, reason = self._is_enum_valid()
-            else:
-                valid, reason = False, f"Unsupported type {type_info.get('type')}"
-        elif isinstance(type_info, list):
-            # Handle cases with multiple types allowed (e.g., ["string", "null"])
-            valid, reason = self._are_multiple_allowable_types_valid(type_info)
-        elif type_info == "boolean":
-            valid, reason = self._is_boolean_valid()
-        elif type_info == "integer":
-            valid, reason = self._is_integer_valid()
-        elif type_info == "number":
-            valid, reason = self._is_number_valid()
-        elif type_info == "string":
-            # Handle string type, even if there's no pattern specified
-            valid, reason = self._is_string_valid()
-        else:
-            valid, reason = False, f"Unknown type {type_info}"
+        return type_check(property)
+    return ValueMemo(check, gen3_name)
+
+
+# every ValueMemo compiled so far, see log_value_memos()
+_value_memos = weakref.WeakSet()
+
+
+def log_value_memos():
+    '''
+    logs the hit rate of each ValueMemo that checked values, e.g. at the
+    end of validation, to show which columns the memos help with and
+    which memos switched themselves off
+    '''
+    memos = sorted((memo for memo in _value_memos if memo.hits or memo.misses), key=lambda memo: memo.name)
+    hits = sum(memo.hits for memo in memos)
+    misses = sum(memo.misses for memo in memos)
+    disabled = sum(1 for memo in memos if not memo.enabled)
+    logger.info(f"value memos: {len(memos)} used, {disabled} switched off, {hits} values reused, {misses} values checked")
+    for memo in memos:
+        logger.info(f"value memo {memo.name}: hit rate {memo.hit_rate():.0%} ({memo.hits} hits, {memo.misses} misses), enabled={memo.enabled}")
+
+
+class ValueMemo(object):
+    '''
+    Remembers the outcome of a compiled check (valid, reason and the
+    converted value) for each value it has checked, so that columns with
+    only a few distinct values, e.g. sex or basis_of_record, are only
+    checked once per value.
+
+    At most max_size values are remembered. Once full, the memo switches
+    itself off if it found fewer values than it checked, e.g. for an
+    md5sum column; otherwise it keeps answering for the values it has.
+    '''
+    def __init__(self, check, name, max_size=128):
+        self._check = check
+        self.name = name
+        self.max_size = max_size
+        self._outcomes = {} # (header, type, repr of value) -> (valid, reason, converted value)
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        _value_memos.add(self)
 
+    def __call__(self, property):
+        if not self.enabled:
+            return self._check(property)
+        # the outcome depends on the header (in messages), and on the
+        # value as its type and representation: 1, 1.0 and True differ
+        data = property.data
+        key = (property.name, type(data), repr(data))
+        outcome = self._outcomes.get(key)
+        if outcome is not None:
+            self.hits += 1
+            property.data = outcome[2]
+            return outcome[0], outcome[1]
+
+        self.misses += 1
+        valid, reason = self._check(property)
+        if len(self._outcomes) < self.max_size:
+            self._outcomes[key] = (valid, reason, property.data)
+        elif self.hits < self.misses:
+            logger.debug(f"switching off {self}: too many distinct values")
+            self.enabled = False
+            self._outcomes = {}
         return valid, reason
 
-    def _is_string_valid(self):
-        """Validates that the property data is a string, setting it to an empty string if it's None or NaN."""
-        if self.data is None or is_nan(self.data):
-            self.data = ""  # Set to an empty string if None or NaN
-        else:
-            self.data = str(self.data)  # Ensure the value is treated as a string        
-        # Since pattern application is handled separately, any string is valid here
-        return True, None
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
 
-    def _is_pattern_valid(self):
-        """Validates the property data against a regex pattern if specified."""
-        free_strings = [
-            "submitter_id",
-            "file_name",
-            "habitat",
-            "geo_loc_name",
-            "environmental_medium",
-            "collected_by",
-            "secondary_identifier",
-            "store_cond"
-        ]
-        actually_integers = [
-            "file_size",
-            "latitude_decimal_degrees",
-            "longitude_decimal_degrees"
-        ]
-        actually_floats = [
-            "coordinate_uncertainty_in_meters",
-        ]
-        '''
-        environmental_medium
-        '''
-
-        if self.gen3_name in actually_integers:
-            return self._is_integer_valid()
-
-        if self.gen3_name in free_strings:
-            # currently a UUID regex is applied, but it should be any string
-            return True, None
+    def __str__(self):
+        return f"ValueMemo(name={self.name}, values={len(self._outcomes)}, hits={self.hits}, misses={self.misses}, enabled={self.enabled})"
 
-        if self.gen3_name in actually_floats:
-            return self._is_number_valid()
+    def __repr__(self):
+        return self.__str__()
 
-        if not self.rule._pattern:
-            return True, None
-        pattern = self.rule._pattern
-        self.rule._pattern = r'{}'.format(pattern)
-        if re.fullmatch(self.rule._pattern, str(self.data)):
+
+def _compile_pattern_check(rule, gen3_name):
+    """Validates the property data against a regex pattern if specified."""
+    if not rule._pattern:
+        return None
+    if gen3_name in ACTUALLY_INTEGERS:
+        return _integer_check(gen3_name)
+    if gen3_name in FREE_STRINGS:
+        # currently a UUID regex is applied, but it should be any string
+        return None
+    if gen3_name in ACTUALLY_FLOATS:
+        return _is_number_valid
+
+    pattern = r'{}'.format(rule._pattern)
+    regex = re.compile(pattern)
+    def is_pattern_valid(property):
+        if regex.fullmatch(str(property.data)):
             return True, None
-        else:
-            return False, f"Value {self.name}; {self.gen3_name} '{self.data}' does not match pattern '{self.rule._pattern}'"
+        return False, f"Value {property.name}; {gen3_name} '{property.data}' does not match pattern '{pattern}'"
+    return is_pattern_valid
+
+
+def _compile_type_check(rule, gen3_name):
+    type_info = rule._type
+    if isinstance(type_info, dict):
+        if 'enum' in type_info:
+            return _enum_check(rule)
+        reason = f"Unsupported type {type_info.get('type')}"
+        return lambda property: (False, reason)
+    if isinstance(type_info, list):
+        # Handle cases with multiple types allowed (e.g., ["string", "null"])
+        return _multiple_allowable_types_check(type_info, gen3_name)
+    if type_info == "boolean":
+        return _is_boolean_valid
+    if type_info == "integer":
+        return _integer_check(gen3_name)
+    if type_info == "number":
+        return _is_number_valid
+    if type_info == "string":
+        # Handle string type, even if there's no pattern specified
+        return _is_string_valid
+    reason = f"Unknown type {type_info}"
+    return lambda property: (False, reason)
+
+
+def _is_string_valid(property):
+    """Validates that the property data is a string, setting it to an empty string if it's None or NaN."""
+    if property.data is None or is_nan(property.data):
+        property.data = ""  # Set to an empty string if None or NaN
+    else:
+        property.data = str(property.data)  # Ensure the value is treated as a string
+    # Since pattern application is handled separately, any string is valid here
+    return True, None
+
 
-    def _is_enum_valid(self):
+def _enum_check(rule):
+    def is_enum_valid(property):
         """Validates if the property data is within allowed enum values."""
-        allowed_values = self.rule._type.get('enum', [])
-        for av in allowed_values:
-            if str(self.data).lower().strip() == str(av).lower():
-                self.data = str(av)  # Set self.data to the correctly formatted value
-                return True, None
-        return False, f"Value '{self.data}' is not in allowed values {allowed_values}"
-
-    def _is_boolean_valid(self):
-        """Checks if the property data can be interpreted as a boolean."""
-        if isinstance(self.data, bool):
+        allowed = rule.getEnumValue(property.data)
+        if allowed is not None:
+            property.data = allowed  # Set data to the correctly formatted value
             return True, None
-        truthy = {'true', 't', 'yes', 'y', '1'}
-        falsy = {'false', 'f', 'no', 'n', '0'}
-        data_str = str(self.data).lower()
-        if data_str in truthy:
-            self.data = True
-            return True, None
-        elif data_str in falsy:
-            self.data = False
-            return True, None
-        return False, f"Expected boolean value but got '{self.data}'"
-
-    def _is_integer_valid(self):
-        """Validates if the property data is an integer."""
-        actually_floats = [
-            "latitude_decimal_degrees",
-            "longitude_decimal_degrees"
-        ]
-        if self.gen3_name in actually_floats:
-            return self._is_number_valid()
-
-        try:
-            self.data = int(self.data)
-            return True, None
-        except ValueError:
-            return False, f"Expected integer but got '{self.data}'"
+        return False, f"Value '{property.data}' is not in allowed values {rule._type.get('enum', [])}"
+    return is_enum_valid
 
-    def _is_number_valid(self):
-        """Validates if the property data is numeric."""
-        try:
-            self.data = float(self.data)
-            return True, None
-        except ValueError:
-            return False, f"Expected numeric value but got '{self.data}'"
 
-    def _are_multiple_allowable_types_valid(self, types):
-        """Validates property data against multiple allowed types."""
-        if self.data is None and 'null' in types:
+_TRUTHY = frozenset(['true', 't', 'yes', 'y', '1'])
+_FALSY = frozenset(['false', 'f', 'no', 'n', '0'])
+
+def _is_boolean_valid(property):
+    """Checks if the property data can be interpreted as a boolean."""
+    if isinstance(property.data, bool):
+        return True, None
+    data_str = str(property.data).lower()
+    if data_str in _TRUTHY:
+        property.data = True
+        return True, None
+    elif data_str in _FALSY:
+        property.data = False
+        return True, None
+    return False, f"Expected boolean value but got '{property.data}'"
+
+
+def _integer_check(gen3_name):
+    if gen3_name in INTEGERS_ACTUALLY_FLOATS:
+        return _is_number_valid
+    return _is_integer_valid
+
+
+def _is_integer_valid(property):
+    """Validates if the property data is an integer."""
+    try:
+        property.data = int(property.data)
+        return True, None
+    except ValueError:
+        return False, f"Expected integer but got '{property.data}'"
+
+
+def _is_number_valid(property):
+    """Validates if the property data is numeric."""
+    try:
+        property.data = float(property.data)
+        return True, None
+    except ValueError:
+        return False, f"Expected numeric value but got '{property.data}'"
+
+
+def _multiple_allowable_types_check(types, gen3_name):
+    """Validates property data against multiple allowed types."""
+    if 'integer' in types:
+        then = _integer_check(gen3_name)
+    elif 'boolean' in types:
+        then = _is_boolean_valid
+    elif 'number' in types:
+        then = _is_number_valid
+    else:
+        reason = f"does not match any allowed types {types}"
+        then = lambda property: (False, f"Value '{property.data}' {reason}")
+    allows_null = 'null' in types
+    allows_string = 'string' in types
+
+    def are_multiple_allowable_types_valid(property):
+        if property.data is None and allows_null:
             return True, None
-        if 'string' in types and (isinstance(self.data, str) or isinstance(self.data, numbers.Number)):
+        if allows_string and (isinstance(property.data, str) or isinstance(property.data, numbers.Number)):
             return True, None
-        if 'integer' in types:
-            return self._is_integer_valid()
-        if 'boolean' in types:
-            return self._is_boolean_valid()
-        if 'number' in types:
-            return self._is_number_valid()
-        return False, f"Value '{self.data}' does not match any allowed types {types}"
\ No newline at end of file
+        return then(property)
+    return are_multiple_allowable_types_valid
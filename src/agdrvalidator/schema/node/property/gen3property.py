@@ -21,6 +21,8 @@ class Gen3(Property):
         self._type = type # PropertyType TODO make sure it was populated correctly
         self._pattern = pattern # regex
         self._isRequired = bool(self._input_name in required)
+        self._validators = {} # output name -> compiled validator, see validator()
+        self._enumLookup = self._buildEnumLookup(type)
 
     def __str__(self):
         representation = {
@@ -38,6 +40,48 @@ class Gen3(Property):
 
     def isRequired(self):
         return self._isRequired
+
+    @staticmethod
+    def _buildEnumLookup(type):
+        '''
+        allowed value in lower case -> allowed value, for enum types;
+        where two allowed values only differ in case, the first one wins
+        '''
+        if not isinstance(type, dict) or "enum" not in type:
+            return None
+        lookup = {}
+        for value in type["enum"]:
+            lookup.setdefault(str(value).lower(), str(value))
+        return lookup
+
+    def getEnumValue(self, value):
+        '''
+        the allowed spelling of value (compared ignoring case and
+        surrounding whitespace), or None if value is not allowed
+        '''
+        return self._enumLookup.get(str(value).lower().strip())
+
+    def validator(self, name, compile):
+        '''
+        returns compile(self, name), compiled once for each name the
+        property is output as (some properties are renamed, and their
+        validation depends on the name)
+
+        compiled on first use rather than at dictionary load: the names
+        are only known once the AGDR mapping uses the property, and the
+        compiled validators are closures, which the cached and compiled
+        dictionaries could not hold anyway
+        '''
+        if name not in self._validators:
+            self._validators[name] = compile(self, name)
+        return self._validators[name]
+
+    def __getstate__(self):
+        # compiled validators are closures, which can not be pickled;
+        # they are compiled again on first use after unpickling
+        state = self.__dict__.copy()
+        state["_validators"] = {}
+        return state
     
     def reset_fields(self):
         self._name = None
@@ -45,4 +89,6 @@ class Gen3(Property):
         self._value = None
         self._required = None
         self._type = None
-        self._pattern = None
\ No newline at end of file
+        self._pattern = None
+        self._validators = {}
+        self._enumLookup = None
\ No newline at end of file
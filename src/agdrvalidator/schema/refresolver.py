@@ -0,0 +1,154 @@
+'''
+This file provides a resolver for the $refs of a Gen3 dictionary.
+
+Most nodes of a Gen3 dictionary include the same definitions, e.g.
+_definitions.yaml#/ubiquitous_properties, or properties referring to
+the same _terms.yaml entries. The resolver expands each $ref target
+exactly once, into an immutable structure, and hands the same object
+to every node that refers to it, so that identical property
+definitions are also shared in memory.
+
+Relative refs (e.g. "#/ubiquitous_properties") are resolved against
+the file the referring definition came from, which is passed in
+explicitly rather than remembered between calls.
+'''
+from agdrvalidator import AgdrFormatException
+from agdrvalidator.utils import logger
+
+logger = logger.setUp(__name__)
+
+
+class FrozenDict(dict):
+    '''
+    a dict that can not be changed once created
+
+    it is still a dict (isinstance checks, repr, ==), so resolved
+    definitions can be used wherever the raw JSON was used before
+    '''
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("resolved dictionary definitions are shared, and can not be changed")
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        # pickle would otherwise rebuild the dict through __setitem__
+        return (FrozenDict, (dict(self),))
+
+
+class FrozenList(list):
+    '''
+    a list that can not be changed once created, see FrozenDict
+    '''
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("resolved dictionary definitions are shared, and can not be changed")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+    append = clear = extend = insert = pop = remove = reverse = sort = _immutable
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+
+def freeze(value):
+    '''
+    immutable copy of a structure parsed from JSON
+    '''
+    if isinstance(value, (FrozenDict, FrozenList)):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+
+class RefResolver(object):
+    '''
+    Expands $refs against the _terms.yaml, _definitions.yaml and
+    _settings.yaml sections of a Gen3 dictionary, memoising each result.
+    '''
+    def __init__(self, terms, definitions, settings):
+        self._lookup = {
+            "_terms.yaml": terms,
+            "_definitions.yaml": definitions,
+            "_settings.yaml": settings
+        }
+        self._resolved = {} # (category, key, isTopLevel) -> frozen properties
+        self.expansions = 0 # number of refs actually expanded
+        self.lookups = 0    # number of refs asked for
+
+    def category(self, ref, base=None):
+        '''
+        the section a ref points into; base is the section a relative
+        ref is resolved against
+        '''
+        category = ref.split("#")[0]
+        if category:
+            return category
+        if not base:
+            raise AgdrFormatException(f"relative $ref {ref} found outside of a dictionary section")
+        return base
+
+    def resolve(self, ref, isTopLevel=True, base=None):
+        '''
+        all the properties referenced by ref, with the properties they
+        refer to substituted in
+
+        if isTopLevel, returns property -> definition, otherwise
+        {key: {property: definition}}, where key is the last part of ref
+        '''
+        self.lookups += 1
+        category = self.category(ref, base)
+        key = ref.split("#")[1].split("/")[-1]
+        memo_key = (category, key, isTopLevel)
+        if memo_key not in self._resolved:
+            self._resolved[memo_key] = freeze(self._expand(category, key, isTopLevel))
+            self.expansions += 1
+        return self._resolved[memo_key]
+
+    def _definition(self, lookup, ref):
+        # for now: assume no recursion needed
+        ref = ref.split("#")
+        category = ref[0]
+        key = ref[1].split("/")[-1]
+        if category in lookup:
+            return {key: lookup[category][key]}
+        else:
+            raise AgdrFormatException(f"could not find definition for {ref}")
+
+    def _expand(self, category, key, isTopLevel):
+        logger.debug(f"expanding $ref {category}#/{key}")
+        lookup = self._lookup
+        raw_properties = {}
+        if category not in lookup:
+            raise AgdrFormatException(f"invalid $ref: {category}#/{key}")
+        for property in lookup[category][key]:
+            if "$ref" in lookup[category][key][property]:
+                # paste in property
+                # add it to the list of properties
+                subkey = lookup[category][key][property]["$ref"]
+                if subkey[0] == '#':
+                    subkey = category + subkey
+                raw_property = self._definition(lookup, subkey)
+                if "term" in raw_property and "$ref" in raw_property["term"]:
+                    term = self._definition(key, raw_property["term"]["$ref"])
+                    del raw_property["term"]
+                    for item in term:
+                        raw_property[item] = term[item]
+                if isTopLevel:
+                    raw_properties[property] = raw_property
+                else:
+                    raw_properties[key] = {property: raw_property}
+            else:
+                if isTopLevel:
+                    raw_properties[property] = lookup[category][key][property]
+                else:
+                    raw_properties[key] = {property: lookup[category][key][property]}
+        return raw_properties
+
+    def __str__(self):
+        return f"RefResolver(expansions={self.expansions}, lookups={self.lookups})"
+
+    def __repr__(self):
+        return self.__str__()
@@ -9,6 +9,7 @@ from agdrvalidator.schema.agdrschema import AGDR as AGDRSchema
 from agdrvalidator.schema.base import Schema as Schema
 from agdrvalidator.schema.gen3schema import Gen3 as Gen3Schema
 from agdrvalidator.schema.node.gen3node import RequiredType as RequiredType
+from agdrvalidator.schema.node.property.agdrproperty import log_value_memos
 from agdrvalidator.utils import logger
 
 logger = logger.setUp(__name__)
@@ -107,11 +108,13 @@ class Dataset(object):
         return str(result)
     
 class AGDRValidator(Schema):
-    def __init__(self, gen3schema, agdrschema, outputfile=None):
+    def __init__(self, gen3schema, agdrschema, outputfile=None, row_cache=None):
         self._gen3schema = gen3schema # contains dictionary structure
         self._agdrschema = agdrschema # contains metadata
         self._root = agdrschema.getRootNode() # only one project node
         self._outputfile = outputfile # where to write the report, None for stdout
+        # RowValidationCache reusing row results from the last run, or None
+        self._row_cache = row_cache
 
         self._metadata_graph = {} # "list" of Dataset objects
 
@@ -383,6 +386,9 @@ class AGDRValidator(Schema):
         if self._outputfile:
             print(f"\tFILE:\t\t{self._outputfile}")
         self._validateSchema(verbose)
+        if self._row_cache:
+            self._row_cache.save()
+        log_value_memos()
         print("...VALIDATION COMPLETE")
 
     def _report_complete(self):
@@ -413,8 +419,13 @@ class AGDRValidator(Schema):
             print(f"\t\t{validation_entry.message}")
             pass
 
+    def _validate_row(self, row):
+        if self._row_cache:
+            return self._row_cache.validate(row)
+        return row.validate()
+
     def _report_node_properties(self, node_type, node, verbose):
-        isValid, reasons = node.metadata.validate()
+        isValid, reasons = self._validate_row(node.metadata)
         if not isValid:
             self._validation_errors_detected = True
             if self._outputfile:
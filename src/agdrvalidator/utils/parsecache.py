@@ -0,0 +1,199 @@
+'''
+This file provides an on-disk cache of parsed metadata spreadsheets.
+
+Researchers typically fix a few cells of a spreadsheet and re-run the
+validator on it many times. Parsing the workbook is a large part of
+each run, so the result of parsing (the SpreadsheetNode objects, the
+template version, etc.) is stored in a cache directory, keyed by a hash
+of the bytes of the xlsx file, the version of the validator and the source of
+the modules that parse it. An unchanged workbook is then not parsed
+again, until the parsing code changes.
+
+The cache is bounded in size: when it grows past its limit, the least
+recently used entries are removed. Anything that goes wrong while
+reading or writing the cache is logged and treated as a cache miss, the
+cache is never a reason for a run to fail.
+'''
+import hashlib
+import os
+import pickle
+import tempfile
+
+import agdrvalidator.globals.version as version
+from agdrvalidator.utils import logger
+
+logger = logger.setUp(__name__)
+
+# bump this when the layout of the cached data changes
+CACHE_FORMAT = 3
+
+# default upper bound on the total size of the cache directory
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+# path of each module -> hash of its source, see sources_digest()
+_source_digests = {}
+
+
+def sources_digest(paths):
+    '''
+    hash of the source of the modules at paths, for keys of cached data
+    that their code derives, like dictionaryKey() does for the compiled
+    dictionary; a changed module then misses the cache instead of
+    reusing data derived by its older code
+    '''
+    digest = hashlib.sha256()
+    for path in paths:
+        if path not in _source_digests:
+            with open(path, "rb") as f:
+                _source_digests[path] = hashlib.sha256(f.read()).hexdigest()
+        digest.update(f"{path}:{_source_digests[path]}".encode())
+    return digest.hexdigest()
+
+
+def _parserSources():
+    '''
+    the modules whose code determines what a parsed spreadsheet looks like
+    '''
+    import agdrvalidator.parser as parser
+    import agdrvalidator.parser.excel.agdrspreadsheet as agdrspreadsheet
+    import agdrvalidator.parser.excel.anchorindex as anchorindex
+    import agdrvalidator.parser.excel.layoutprofile as layoutprofile
+    import agdrvalidator.parser.excel.sheetcache as sheetcache
+    import agdrvalidator.schema.agdrspreadsheet_validator as agdrspreadsheet_validator
+    import agdrvalidator.utils.array as array
+    import agdrvalidator.utils.rich_tabular as rich_tabular
+    modules = (parser, agdrspreadsheet, anchorindex, layoutprofile, sheetcache, agdrspreadsheet_validator, array, rich_tabular)
+    return [module.__file__ for module in modules] + [__file__]
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "agdrvalidator")
+
+
+class ParseCache(object):
+    '''
+    A directory of pickled parse results, one file per key.
+    '''
+    SUFFIX = ".pickle"
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, path):
+        '''
+        key for the parse result of the file at path
+
+        raises FileNotFoundError if there is no such file, just like
+        opening the workbook would
+        '''
+        digest = hashlib.sha256()
+        digest.update(f"{version.version()}:{CACHE_FORMAT}:{sources_digest(_parserSources())}:".encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def named_key(self, *parts):
+        '''
+        key for data that is not derived from the bytes of a file,
+        e.g. data kept between runs on the same spreadsheet path
+
+        like key(), it changes with the parsing code; data derived by
+        other code should pass sources_digest() of that code as a part
+        '''
+        digest = hashlib.sha256()
+        digest.update(f"{version.version()}:{CACHE_FORMAT}:{sources_digest(_parserSources())}".encode())
+        for part in parts:
+            digest.update(f":{part}".encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}{self.SUFFIX}")
+
+    def load(self, key):
+        '''
+        cached parse result for key, or None
+        '''
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"ignoring unreadable parse cache entry {path}: {e}")
+            self._remove(path)
+            self.misses += 1
+            return None
+        try:
+            # keep track of recent use for eviction
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        logger.info(f"parse cache hit: {path}")
+        return data
+
+    def store(self, key, data):
+        '''
+        store a parse result, then evict old entries if the cache
+        has grown too large
+        '''
+        path = self._path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # write to a temporary file first, so that a concurrent or
+            # interrupted run never sees a partially written entry
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, path)
+            except BaseException:
+                self._remove(tmp)
+                raise
+        except Exception as e:
+            logger.warning(f"could not write parse cache entry {path}: {e}")
+            return
+        logger.info(f"parse cache stored: {path}")
+        self.evict()
+
+    def evict(self):
+        '''
+        remove the least recently used entries until the cache is
+        within its size limit
+        '''
+        try:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith(self.SUFFIX):
+                    stat = os.stat(os.path.join(self.directory, name))
+                    entries.append((stat.st_mtime, stat.st_size, name))
+        except OSError as e:
+            logger.warning(f"could not inspect parse cache {self.directory}: {e}")
+            return
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logger.info(f"parse cache evicting: {name}")
+            self._remove(os.path.join(self.directory, name))
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def __str__(self):
+        return f"ParseCache(directory={self.directory}, max_bytes={self.max_bytes}, hits={self.hits}, misses={self.misses})"
+
+    def __repr__(self):
+        return self.__str__()
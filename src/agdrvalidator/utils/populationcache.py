@@ -0,0 +1,157 @@
+'''
+This file provides a cache of populated AGDR nodes, kept between runs
+of the validator.
+
+Populating an AGDR node turns the rows of a spreadsheet table into
+AGDRRow objects, each cell paired with its dictionary rule. It only
+depends on that table, on the project and program, on the rules of the
+dictionary node, and for some nodes on other tables: contributors,
+experiments and publications look up the datasets of the workbook,
+samples the submitter_ids of the genomes and metagenomes. Generated ids
+and counters come from the position of a row in its table, so a node
+is cached as a whole, keyed by a fingerprint of all of these and of the
+source of the code that populates it. A table
+that has not changed is not populated again, unless a table it is
+linked to has changed, e.g. when a dataset is renamed, its
+contributors, experiments and publications are populated again.
+
+Populated rows refer to the nodes and properties of the dictionary.
+Those are not stored, they are looked up in the loaded dictionary when
+the rows are read back. The entries are stored through a ParseCache,
+so they share its directory, its size limit and its eviction.
+'''
+import hashlib
+import io
+import pickle
+
+from agdrvalidator.utils import logger
+from agdrvalidator.utils.parsecache import sources_digest
+
+logger = logger.setUp(__name__)
+
+
+def _update_table(digest, table):
+    if table is None:
+        digest.update(b"None")
+        return
+    digest.update(repr(table.name).encode())
+    for row in table:
+        cells = [(prop.name, type(prop.data).__name__, prop.data, str(prop.location), prop.required) for prop in row.data]
+        digest.update(repr((row.sheet_name, cells)).encode())
+
+
+def _rules(gen3node):
+    return [gen3node.name] + [
+        (rule._name, rule._input_name, repr(rule._type), rule._pattern, rule.isRequired())
+        for rule in gen3node.getProperties()
+    ]
+
+
+def _populationSources():
+    '''
+    the modules whose code determines what a populated node looks like
+    '''
+    import agdrvalidator.schema.agdrschema as agdrschema
+    import agdrvalidator.schema.node.agdrmapping as agdrmapping
+    import agdrvalidator.schema.node.agdrnode as agdrnode
+    import agdrvalidator.schema.node.property.agdrproperty as agdrproperty
+    import agdrvalidator.schema.node.property.gen3property as gen3property
+    import agdrvalidator.utils.rich_tabular as rich_tabular
+    modules = (agdrschema, agdrmapping, agdrnode, agdrproperty, gen3property, rich_tabular)
+    return [module.__file__ for module in modules] + [__file__]
+
+
+def _references(gen3nodes):
+    '''
+    persistent id -> object of the loaded dictionary, for the Gen3
+    nodes and their properties
+    '''
+    references = {}
+    for gen3node in gen3nodes:
+        references[("node", gen3node.name)] = gen3node
+        for position, rule in enumerate(gen3node.getProperties()):
+            references[("rule", gen3node.name, position)] = rule
+    return references
+
+
+class _Pickler(pickle.Pickler):
+    def __init__(self, file, references):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._ids = {id(obj): pid for pid, obj in references.items()}
+        self._types = {type(obj) for obj in references.values()}
+
+    def persistent_id(self, obj):
+        pid = self._ids.get(id(obj))
+        if pid is None and type(obj) in self._types:
+            # a copy would no longer be part of the dictionary
+            raise pickle.PicklingError(f"{type(obj).__name__} is not one of the cached nodes")
+        return pid
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file, references):
+        super().__init__(file)
+        self._references = references
+
+    def persistent_load(self, pid):
+        return self._references[tuple(pid)]
+
+
+class PopulationCache(object):
+    '''
+    Populated nodes, by fingerprint of everything their population
+    depends on.
+    '''
+    def __init__(self, parse_cache):
+        self._parse_cache = parse_cache
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, gen3nodes, tables, context):
+        '''
+        key of the nodes of gen3nodes populated from tables (the
+        SpreadsheetNodes they read, None for a missing table); context
+        is anything else they read, fingerprinted by its repr
+        '''
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(sources_digest(_populationSources()).encode())
+        for gen3node in gen3nodes:
+            digest.update(repr(_rules(gen3node)).encode())
+        for table in tables:
+            _update_table(digest, table)
+        digest.update(repr(context).encode())
+        return self._parse_cache.named_key("nodes", digest.hexdigest())
+
+    def load(self, key, gen3nodes):
+        '''
+        what was stored for key, with its references to gen3nodes
+        restored, or None
+        '''
+        stored = self._parse_cache.load(key)
+        if stored is not None:
+            try:
+                value = _Unpickler(io.BytesIO(stored), _references(gen3nodes)).load()
+                self.hits += 1
+                return value
+            except Exception as e:
+                logger.warning(f"ignoring unreadable population cache entry: {e}")
+        self.misses += 1
+        return None
+
+    def store(self, key, gen3nodes, value):
+        buffer = io.BytesIO()
+        try:
+            _Pickler(buffer, _references(gen3nodes)).dump(value)
+        except Exception as e:
+            logger.warning(f"could not cache the population of {[gen3node.name for gen3node in gen3nodes]}: {e}")
+            return
+        self._parse_cache.store(key, buffer.getvalue())
+
+    def log_summary(self):
+        logger.info(f"population cache: {self.hits} tables reused, {self.misses} tables populated")
+
+    def __str__(self):
+        return f"PopulationCache(hits={self.hits}, misses={self.misses})"
+
+    def __repr__(self):
+        return self.__str__()
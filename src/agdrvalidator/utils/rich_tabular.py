@@ -3,6 +3,8 @@ this file contains data container classes used to represent
 metadata from excel workbook input.
 '''
 
+import numpy as np
+import pandas as pd
 from openpyxl.utils import get_column_letter
 
 
@@ -13,6 +15,9 @@ class CellLocation(object):
     a string representation will give the cell name instead of 
     x, y coordinates, e.g. 'A1' rather than (0, 0)
     '''
+    # there is one of these per cell, so no per-instance __dict__
+    __slots__ = ("row", "column")
+
     def __init__(self, row, column):
         self.row = row
         self.column = column
@@ -37,6 +42,9 @@ class SpreadsheetProperty(object):
     If the SpreadsheetProperty has no data, then it represents a 
     header cell
     '''
+    # there is one of these per cell, so no per-instance __dict__
+    __slots__ = ("name", "data", "location", "required")
+
     def __init__(self, name, value, cell_location:CellLocation, required=False):
         self.name = name
         self.data = value
@@ -53,11 +61,30 @@ class SpreadsheetRow(object):
     '''
     This class represents an entire row of data from a 
     table in the spreadsheet input
+
+    Properties are looked up by name through an index of
+    lower-cased name -> position in the row. All rows of a table have
+    the same headers, so they can share a single index, see
+    SpreadsheetRow.build_index().
     '''
-    def __init__(self, properties: list[SpreadsheetProperty], sheet_name):
+    __slots__ = ("data", "sheet_name", "headers", "_index")
+
+    @staticmethod
+    def build_index(properties):
+        '''
+        index of lower-cased property name -> position of the first
+        property with that name
+        '''
+        index = {}
+        for position, prop in enumerate(properties):
+            index.setdefault(str(prop.name).lower(), position)
+        return index
+
+    def __init__(self, properties: list[SpreadsheetProperty], sheet_name, index=None):
         self.data = properties # list of SpreadsheetProperty objects
         self.sheet_name = sheet_name
         self.headers = None # to be set later
+        self._index = index # name -> position, built on first use if None
 
     def __getitem__(self, index):
         return self.data[index]
@@ -72,12 +99,21 @@ class SpreadsheetRow(object):
         # iterate over properties
         return iter(self.data)
 
+    def index(self):
+        '''
+        lower-cased property name -> position in the row, the same
+        object for all rows of a table that share their index
+        '''
+        if self._index is None:
+            self._index = SpreadsheetRow.build_index(self.data)
+        return self._index
+
     def get(self, key):
         # retrieve a property
-        for prop in self.data:
-            if key.lower() == str(prop.name).lower():
-                return prop
-        return None
+        position = self.index().get(key.lower())
+        if position is None:
+            return None
+        return self.data[position]
 class SpreadsheetNode(object):
     '''
     This class represents all rows of data for a particular 
@@ -88,6 +124,7 @@ class SpreadsheetNode(object):
     def __init__(self, name, data=[]):
         self.name = name
         self.data: list[SpreadsheetRow] = data
+        self._presence = None # see presence()
 
     def __str__(self):
         if not self.data:
@@ -104,4 +141,28 @@ class SpreadsheetNode(object):
 
     def update(self, other):
         # update data with data from other
-        self.data.extend(other.data)
\ No newline at end of file
+        self.data.extend(other.data)
+        self._presence = None
+
+    def presence(self):
+        '''
+        which cells of the table have a value, as a pair of NumPy bool
+        matrices (rows x columns, columns by position in the rows):
+            notna  -- the cell is neither empty nor NaN
+            filled -- notna, and the value is not false (e.g. "" or 0)
+
+        computed once per table; None if the rows do not share a single
+        header index, e.g. experiments read from several sheets
+        '''
+        if self._presence is None and self.data:
+            index = self.data[0].index()
+            width = len(self.data[0].data)
+            if all(row.index() is index and len(row.data) == width for row in self.data):
+                values = np.empty((len(self.data), width), dtype=object)
+                for position, row in enumerate(self.data):
+                    values[position, :] = [prop.data for prop in row.data]
+                notna = pd.notna(values)
+                filled = notna.copy()
+                filled[notna] = values[notna].astype(bool)
+                self._presence = (notna, filled)
+        return self._presence
\ No newline at end of file
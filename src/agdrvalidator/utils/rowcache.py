@@ -0,0 +1,109 @@
+'''
+This file provides a cache of per-row validation results, kept between
+runs of the validator on the same spreadsheet.
+
+When a researcher corrects a few cells and re-runs the validator, most
+rows of the spreadsheet are unchanged. Validating a row (AGDRRow.validate)
+only depends on the contents of that row and on the dictionary rules
+for its properties, so each row is fingerprinted, and rows whose
+fingerprint was already validated in the previous run reuse that
+result instead of being validated again. Validation also normalises
+property values (e.g. enum casing, integers), so those normalised
+values are cached and restored too. The cache is keyed on the source
+of the validation code as well, so a changed validator validates every
+row again.
+
+The results are stored through a ParseCache, so they share its
+directory, its size limit and its eviction.
+'''
+import hashlib
+import os
+
+from agdrvalidator.utils import logger
+from agdrvalidator.utils.parsecache import sources_digest
+
+logger = logger.setUp(__name__)
+
+
+def fingerprint(row):
+    '''
+    fingerprint of everything AGDRRow.validate() depends on
+    '''
+    parts = [row.gen3_name, row.sheet_name]
+    for prop in row.data:
+        rule = prop.rule
+        if rule:
+            rule_parts = (rule._name, repr(rule._type), rule._pattern, rule.isRequired())
+        else:
+            rule_parts = None
+        parts.append((
+            prop.name,
+            prop.gen3_name,
+            type(prop.data).__name__,
+            repr(prop.data),
+            str(prop.location),
+            prop.required,
+            rule_parts,
+        ))
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).digest()
+
+
+def _validationSources():
+    '''
+    the modules whose code determines the result of validating a row
+    '''
+    import agdrvalidator.schema.node.agdrnode as agdrnode
+    import agdrvalidator.schema.node.property.agdrproperty as agdrproperty
+    import agdrvalidator.schema.node.property.gen3property as gen3property
+    import agdrvalidator.utils as utils
+    return [module.__file__ for module in (agdrnode, agdrproperty, gen3property, utils)] + [__file__]
+
+
+class RowValidationCache(object):
+    '''
+    Validation results of the rows of one spreadsheet, by fingerprint.
+
+    Only the results of the rows seen in the current run are saved, so
+    the cache never holds more rows than the spreadsheet has.
+    '''
+    def __init__(self, parse_cache, spreadsheet_path):
+        self._parse_cache = parse_cache
+        self._key = parse_cache.named_key("rows", os.path.abspath(spreadsheet_path), sources_digest(_validationSources()))
+        self._previous = None # fingerprint -> result, from the last run
+        self._current = {}    # fingerprint -> result, from this run
+        self.hits = 0
+        self.misses = 0
+
+    def validate(self, row):
+        '''
+        same as row.validate(), reusing the result of the last run
+        when the row has not changed
+        '''
+        if self._previous is None:
+            self._previous = self._parse_cache.load(self._key) or {}
+        key = fingerprint(row)
+        result = self._current.get(key) or self._previous.get(key)
+        if result is None:
+            self.misses += 1
+            is_valid, reasons = row.validate()
+            values = tuple(prop.data for prop in row.data)
+            result = (is_valid, list(reasons), values)
+        else:
+            self.hits += 1
+            is_valid, reasons, values = result
+            for prop, value in zip(row.data, values):
+                prop.data = value
+            reasons = list(reasons)
+        self._current[key] = result
+        return is_valid, reasons
+
+    def save(self):
+        logger.info(f"row validation cache: {self.hits} rows reused, {self.misses} rows validated")
+        if self.misses or len(self._current) != len(self._previous or {}):
+            self._parse_cache.store(self._key, self._current)
+
+    def __str__(self):
+        return f"RowValidationCache(hits={self.hits}, misses={self.misses})"
+
+    def __repr__(self):
+        return self.__str__()